@@ -0,0 +1,41 @@
+"""
+Serial vs concurrent IngestService against FakeReddit with injected latency.
+
+    python -m bench.bench_ingest --latency 0.05 --concurrency 8
+"""
+import argparse
+import time
+
+import yaml
+
+from bench.fake_reddit import FakeReddit
+from src.ingest import IngestService
+
+def run(cfg, latency, fail_rate, concurrency):
+    cfg = dict(cfg, ingest_concurrency=concurrency, requests_per_minute=10**9, retry_backoff_s=0.01)
+    client = FakeReddit(latency=latency, fail_rate=fail_rate)
+    svc = IngestService(client, cfg, repository=None)
+    t0 = time.perf_counter()
+    svc.fetch_posts()
+    svc.fetch_comments()
+    return time.perf_counter() - t0, svc, client
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingest benchmark against an offline fake Reddit client")
+    ap.add_argument("--config", default="config/scope_energy.yaml")
+    ap.add_argument("--latency", type=float, default=0.05, help="Seconds per fake API call")
+    ap.add_argument("--fail_rate", type=float, default=0.05, help="Fraction of calls raising a retryable error")
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+
+    for n in (1, args.concurrency):
+        secs, svc, client = run(cfg, args.latency, args.fail_rate, n)
+        ids = svc.posts_df["post_id"]
+        assert ids.is_unique, "duplicate posts after de-duplication"
+        print(f"concurrency={n:<3} {secs:6.2f}s  posts={len(ids)} comments={len(svc.comments_df)} api_calls={client.calls}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Golden-output check + microbenchmark for TextNormalizer.
+
+Compares TextNormalizer against the original regex_filtering / is_spam
+implementations (kept verbatim below) on every title+selftext / comment
+text in the given JSONL files plus a set of edge cases, then times both.
+
+    python -m bench.bench_normalizer data/raw/scope_energy/*.jsonl
+"""
+import argparse
+import glob
+import json
+import re
+import sys
+import time
+
+from src.clean import TextNormalizer
+
+def legacy_regex_filtering(clean_text: str):
+    clean_text = re.sub(r"[\w\.-]+@[\w\.-]+\.\w+", r"<\g<0>>", clean_text) # puts <> around email addresses
+    clean_text = re.sub(r"\s{2,}", " ", clean_text) # removes repeated spaces
+    clean_text = re.sub(r"(https?://[^\s]+|www\.[^\s]+)", r"<\g<0>>", clean_text) # puts <> around URL
+    clean_text = re.sub(r"^>.*$", "", clean_text, flags=re.MULTILINE) # Remove blockquotes at the start of a line (> something)
+    clean_text = re.sub(r"```.*?```", "", clean_text, flags=re.DOTALL) # Remove code blocks wrapped in triple backticks (```...```)
+    clean_text = re.sub(r"`[^`]+`", "", clean_text) # Remove inline code wrapped in single backticks (`...`)
+    return clean_text
+
+def legacy_is_spam(clean_text: str) -> bool:
+    spam_keywords = ["buy now", "free", "click here", "subscribe", "visit", "offer"]
+    if any(word in clean_text.lower() for word in spam_keywords):
+        return True
+    if re.search(r"(https?://[^\s]+)", clean_text):  # only link
+        if len(clean_text.split()) <= 3:
+            return True
+    if clean_text.count("!") > 5:
+        return True
+    return False
+
+def legacy(raw: str):
+    text = legacy_regex_filtering(raw)
+    return text, legacy_is_spam(text), len(text.split()), text.lower()
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "plain text about oil",
+    "mail me at a.b-c@example.co.uk  now",
+    "see https://example.com/x?y=1 and www.foo.org",
+    "https://only.link",
+    "> quoted line\nreal line\n>another",
+    "text ```code\nblock``` more `inline` end",
+    "`a```x```b`",
+    "unclosed ``` fence",
+    "FREE money!!!!!!",
+    "Click Here to Subscribe",
+    "x@y.z https://a@b.com www.c@d.ef",
+    "line one\n\n> quote after blank\n  spaced   out\ttabs",
+    "!!!!!",
+    "http:// nothing",
+]
+
+def load_texts(paths):
+    texts = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("is_comment"):
+                    texts.append(str(rec.get("comment_text", "")))
+                else:
+                    texts.append(" ".join([rec.get("title", ""), rec.get("selftext", "")]).strip())
+    return texts
+
+def check_golden(norm: TextNormalizer, texts) -> int:
+    mismatches = 0
+    for raw in texts:
+        n = norm.normalize(raw)
+        if (n.text, n.is_spam, n.n_words, n.lower) != legacy(raw):
+            mismatches += 1
+            print(f"[mismatch] {raw[:80]!r}")
+    return mismatches
+
+def time_per_record(fn, texts, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for raw in texts:
+            fn(raw)
+    return (time.perf_counter() - t0) / (repeat * len(texts))
+
+def main():
+    ap = argparse.ArgumentParser(description="Golden check + microbenchmark: TextNormalizer vs regex_filtering/is_spam")
+    ap.add_argument("inputs", nargs="*", help="Raw JSONL files (default: data/raw/*/*.jsonl)")
+    ap.add_argument("--repeat", type=int, default=200, help="Timing passes over the corpus")
+    args = ap.parse_args()
+
+    paths = args.inputs or sorted(p for p in glob.glob("data/raw/*/*.jsonl"))
+    texts = load_texts(paths) + EDGE_CASES
+    norm = TextNormalizer()
+
+    mismatches = check_golden(norm, texts)
+    print(f"golden: {len(texts) - mismatches}/{len(texts)} identical")
+    if mismatches:
+        sys.exit(1)
+
+    old_us = time_per_record(legacy, texts, args.repeat) * 1e6
+    new_us = time_per_record(norm.normalize, texts, args.repeat) * 1e6
+    print(f"legacy:     {old_us:8.2f} us/record")
+    print(f"normalizer: {new_us:8.2f} us/record  ({old_us / new_us:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Per-stage and end-to-end pipeline benchmark on a seeded synthetic corpus.
+
+Each stage runs in a fresh process, so its peak RSS is its own, and reads
+the previous stage's output from the bench workdir. One JSON line per run
+(git commit, parameters, corpus counts, per-stage wall/CPU/RSS/records per
+second) is appended to the results file; --compare prints the change in
+records/sec against the last earlier run with the same parameters.
+
+    python -m bench.bench_pipeline --posts 20000 --days 10 --compare
+    python -m bench.bench_pipeline --posts 1000000 --workers 8 --stages clean process_file_columnar
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import yaml
+
+STAGES = ["generate", "clean", "sentiment", "process_file", "process_file_columnar", "aggregate_daily", "end_to_end"]
+# input each stage reads, and the stage that writes it
+NEEDS = {"clean": ("raw", "generate"), "sentiment": ("clean", "clean"), "process_file": ("clean", "clean"),
+         "process_file_columnar": ("clean", "clean"), "aggregate_daily": ("scored", "process_file")}
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+def stage_paths(workdir, storage):
+    return {
+        "raw_dir": os.path.join(workdir, "raw"),
+        "raw": os.path.join(workdir, "raw_combined.jsonl"),
+        "clean": storage.path(os.path.join(workdir, "clean_posts")),
+        "scored": storage.path(os.path.join(workdir, "scored_posts")),
+        "scored_columnar": storage.path(os.path.join(workdir, "scored_posts_columnar")),
+        "features": os.path.join(workdir, "features_daily.csv"),
+    }
+
+def run_stage(stage, cfg, params):
+    """Runs in a fresh process; returns the stage's StageStats dicts."""
+    from src.clean import Cleaner
+    from src.features import FeatureProcessor
+    from src.instrument import RunReport
+    from src.storage import get_storage
+    from src.utils import combine_jsonl
+
+    storage = get_storage(params["storage"])
+    paths = stage_paths(params["workdir"], storage)
+    if stage in NEEDS and not os.path.exists(paths[NEEDS[stage][0]]):
+        raise FileNotFoundError(f"{paths[NEEDS[stage][0]]} is missing: run the {NEEDS[stage][1]} stage first "
+                                f"with the same --storage")
+    report = RunReport(params["workdir"])
+    cleaner = Cleaner(cfg, storage=storage)
+    feats = FeatureProcessor(cfg, storage=storage)
+
+    def clean():
+        with report.stage("text_construction") as st:
+            rf, records = report.timed("row_filtering", cleaner.row_filtering(paths["raw"], 0, 2**63 - 1, workers=params["workers"]))
+            st.records_out = cleaner.text_construction(records, paths["clean"])
+            st.records_in = rf.records_out
+        rf.records_in = cleaner.counts["lines_read"]
+        # spam is dropped by text_construction, after row_filtering kept the record
+        rf.extra["drops"] = {k[5:]: v for k, v in sorted(cleaner.counts.items()) if k.startswith("drop_") and k != "drop_spam"}
+        st.extra["drops"] = {"spam": cleaner.counts["drop_spam"]}
+
+    if stage == "generate":
+        from bench.synth import SyntheticCorpus
+
+        with report.stage("generate") as st:
+            corpus = SyntheticCorpus(cfg, seed=params["seed"], start=params["start"], days=params["days"],
+                                     posts_per_day=params["posts_per_day"])
+            files = corpus.write(paths["raw_dir"])
+            combine_jsonl(files, paths["raw"])
+            st.records_out = corpus.counts["posts"] + corpus.counts["comments"]
+            st.extra["corpus"] = corpus.counts
+            st.extra["raw_mb"] = round(os.path.getsize(paths["raw"]) / 2**20, 1)
+    elif stage == "clean":
+        clean()
+    elif stage == "sentiment":
+        # every backend on the same cleaned texts, plus agreement with VADER
+        import numpy as np
+        from src.sentiment import BACKENDS
+
+        texts = [df["text_clean"] for df in storage.read_frames(paths["clean"], columns=["text_clean"])]
+        texts = [t for part in texts for t in part.fillna("").astype(str).tolist()]
+        scores = {}
+        for name, backend in BACKENDS.items():
+            scorer = backend()
+            with report.stage(f"sentiment:{name}") as st:
+                scores[name] = [scorer.score_batch(texts[i:i + 1000]) for i in range(0, len(texts), 1000)]
+                st.records_in = st.records_out = len(texts)
+            if name != "vader":
+                ref = np.concatenate([b["compound"] for b in scores["vader"]])
+                diff = np.abs(np.concatenate([b["compound"] for b in scores[name]]) - ref)
+                st.extra["compound_max_abs_diff"] = float(diff.max()) if len(diff) else 0.0
+                st.extra["compound_within_1e-4"] = float((diff <= 1e-4).mean()) if len(diff) else 1.0
+    elif stage in ("process_file", "process_file_columnar"):
+        with report.stage(stage) as st:
+            if stage == "process_file":
+                st.records_out = feats.process_file(paths["clean"], paths["scored"])
+            else:
+                st.records_out = feats.process_file_columnar(paths["clean"], paths["scored_columnar"])
+            st.records_in = st.records_out
+    elif stage == "aggregate_daily":
+        n_scored = sum(len(df) for df in storage.read_frames(paths["scored"], columns=["created_utc"]))
+        with report.stage(stage) as st:
+            st.records_in = n_scored
+            st.records_out = len(feats.aggregate_daily(paths["scored"], paths["features"]))
+    elif stage == "end_to_end":
+        # what run.py does for one scope, minus prices/evaluation
+        with report.stage("end_to_end") as total:
+            with report.stage("combine"):
+                combine_jsonl(sorted(glob.glob(os.path.join(paths["raw_dir"], "*", "*.jsonl"))), paths["raw"])
+            clean()
+            with report.stage("process_file") as st:
+                scored = st.records_out = feats.process_file_columnar(paths["clean"], paths["scored"]) if params["columnar"] \
+                    else feats.process_file(paths["clean"], paths["scored"])
+            with report.stage("aggregate_daily") as st:
+                st.records_out = len(feats.aggregate_daily(paths["scored"], paths["features"]))
+        total.records_in = cleaner.counts["lines_read"]
+        total.records_out = scored
+        return [total.to_dict()]
+    else:
+        raise ValueError(f"Unknown stage: {stage} (choose from {STAGES})")
+    return [st.to_dict() for st in report.stages]
+
+def corpus_params(params):
+    return {k: params[k] for k in ("config", "seed", "start", "days", "posts_per_day")}
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark pipeline stages on a synthetic corpus")
+    ap.add_argument("--config", default="config/scope_energy.yaml")
+    ap.add_argument("--posts", type=int, default=20_000, help="Total synthetic posts (comments come on top)")
+    ap.add_argument("--days", type=int, default=10)
+    ap.add_argument("--start", default="2025-01-01")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=1, help="Language detection processes")
+    ap.add_argument("--storage", default="jsonl", choices=["jsonl", "parquet"])
+    ap.add_argument("--columnar", action="store_true", help="end_to_end scores with process_file_columnar")
+    ap.add_argument("--sentiment_backend", choices=["vader", "lexicon"], help="Override the config's sentiment_backend")
+    ap.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    ap.add_argument("--workdir", default="data/bench")
+    ap.add_argument("--results", default="bench/results.jsonl")
+    ap.add_argument("--compare", action="store_true", help="Compare with the last earlier run with the same parameters")
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    if args.sentiment_backend:
+        cfg["sentiment_backend"] = args.sentiment_backend
+    params = {
+        "config": args.config, "seed": args.seed, "start": args.start, "days": args.days,
+        "posts_per_day": max(1, args.posts // args.days), "workers": args.workers,
+        "storage": args.storage, "columnar": args.columnar, "workdir": args.workdir,
+        "sentiment_backend": cfg.get("sentiment_backend", "vader"),
+    }
+    os.makedirs(args.workdir, exist_ok=True)
+
+    # the corpus is only regenerated when its parameters change
+    marker = os.path.join(args.workdir, "corpus.json")
+    stages = list(args.stages)
+    have = None
+    if os.path.exists(marker):
+        with open(marker) as f:
+            have = json.load(f)
+    if "generate" not in stages and (have is None or have["params"] != corpus_params(params)):
+        stages.insert(0, "generate")
+
+    results, corpus = [], have["counts"] if have else None
+    ctx = get_context("spawn")
+    for stage in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            stats = pool.submit(run_stage, stage, cfg, params).result()
+        for d in stats:
+            print(f"{d['stage']:<24}{d['wall_s']:>9.2f}s{d['cpu_s']:>9.2f} cpu{d['peak_rss_mb'] or 0:>8.0f} MB"
+                  f"{d['records_per_s'] or 0:>12.0f} rec/s")
+        if stage == "generate":
+            corpus = stats[0]["corpus"]
+            with open(marker, "w") as f:
+                json.dump({"params": corpus_params(params), "counts": corpus}, f)
+            if "generate" not in args.stages:
+                continue
+        results.extend(stats)
+
+    commit, dirty = git_commit()
+    entry = {
+        "time_utc": int(time.time()),
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {k: v for k, v in params.items() if k != "workdir"},
+        "corpus": corpus,
+        "stages": results,
+    }
+    previous = []
+    if args.compare and os.path.exists(args.results):
+        with open(args.results) as f:
+            previous = [e for e in map(json.loads, f) if e["params"] == entry["params"]]
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"Results appended to {args.results}")
+
+    if previous:
+        base = previous[-1]
+        old = {d["stage"]: d for d in base["stages"]}
+        print(f"\nvs {base['git_commit']}{' (dirty)' if base['git_dirty'] else ''}:")
+        for d in results:
+            o = old.get(d["stage"])
+            if o and o.get("records_per_s") and d.get("records_per_s"):
+                print(f"{d['stage']:<24}{d['records_per_s'] / o['records_per_s']:>8.2f}x rec/s"
+                      f"{(d['peak_rss_mb'] or 0) - (o['peak_rss_mb'] or 0):>+9.0f} MB")
+    elif args.compare:
+        print("No earlier run with the same parameters to compare against.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Golden-output check for the multi-scope fan-out.
+
+Runs one scope config through the single-scope pipeline (row_filtering ->
+text_construction -> process_file -> aggregate_daily) and through
+build_corpus + ScopeRunner on the same raw records: a seeded synthetic
+corpus plus edge cases whose cleaned text ends up empty. Scored records
+and daily features must match.
+
+    python -m bench.check_fanout --posts 3000 --days 5
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import yaml
+
+from bench.synth import SyntheticCorpus
+from src.clean import Cleaner
+from src.fanout import build_corpus, ScopeRunner
+from src.features import FeatureProcessor
+from src.storage import JsonlStorage
+
+# in scope through the raw title, but nothing is left of it after cleaning
+EDGE_TITLES = [
+    "`$XOM looks great today and the whole sector is rallying`",
+    "```\nCVX = 'terrible quarter, awful guidance'\n```",
+    "> Exxon is going to crash hard this week",
+]
+
+def edge_records(start_ts: int):
+    return [{"post_id": f"edge{i}", "subreddit": "stocks", "created_utc": start_ts + 3600 * (i + 1), "title": title,
+             "selftext": "", "score": 50, "num_comments": 0, "is_comment": False}
+            for i, title in enumerate(EDGE_TITLES)]
+
+def main():
+    ap = argparse.ArgumentParser(description="Check build_corpus + ScopeRunner against the single-scope pipeline")
+    ap.add_argument("--config", default="config/scope_energy.yaml")
+    ap.add_argument("--posts", type=int, default=3000)
+    ap.add_argument("--days", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default="data/bench/check_fanout")
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    os.makedirs(args.workdir, exist_ok=True)
+    path = lambda name: os.path.join(args.workdir, name)
+    storage = JsonlStorage()
+
+    corpus = SyntheticCorpus(cfg, seed=args.seed, days=args.days, posts_per_day=max(1, args.posts // args.days))
+    start_ts = int(corpus.start.timestamp())
+    end_ts = start_ts + args.days * 86400 - 1
+    with storage.writer(path("raw.jsonl")) as out:
+        for rec in edge_records(start_ts):
+            out.write(rec)
+        for rec in corpus.records():
+            out.write(rec)
+
+    # single scope
+    cleaner = Cleaner(cfg)
+    feats = FeatureProcessor(cfg)
+    cleaner.text_construction(cleaner.row_filtering(path("raw.jsonl"), start_ts, end_ts), path("clean_single.jsonl"))
+    feats.process_file(path("clean_single.jsonl"), path("scored_single.jsonl"))
+    single = feats.aggregate_daily(path("scored_single.jsonl"), path("features_single.csv"))
+
+    # fan-out
+    build_corpus(path("raw.jsonl"), path("corpus.jsonl"), start_ts, end_ts, Cleaner({}),
+                 FeatureProcessor({"sentiment_backend": cfg.get("sentiment_backend", "vader")}))
+    ScopeRunner(cfg).run(path("corpus.jsonl"), path("features_fanout.csv"), scored_out=path("scored_fanout.jsonl"))
+    fanout = FeatureProcessor(cfg).aggregate_daily(path("scored_fanout.jsonl"), path("features_fanout.csv"))
+
+    failures = []
+    a = {r["post_id"]: r for r in storage.read_records(path("scored_single.jsonl"))}
+    b = {r["post_id"]: r for r in storage.read_records(path("scored_fanout.jsonl"))}
+    if a.keys() != b.keys():
+        failures.append(f"scored records: {len(a)} single vs {len(b)} fan-out, "
+                        f"only in fan-out: {sorted(b.keys() - a.keys())[:5]}, only in single: {sorted(a.keys() - b.keys())[:5]}")
+    for pid in sorted(a.keys() & b.keys()):
+        ra, rb = a[pid], b[pid]
+        if ra["in_scope"] != rb["in_scope"] or ra["compound"] != rb["compound"] \
+                or not np.isclose(ra["weight"], rb["weight"], rtol=1e-12, atol=0.0):
+            failures.append(f"{pid}: in_scope/compound/weight differ")
+    if list(single.index) != list(fanout.index) or \
+            not np.allclose(single.to_numpy(float), fanout.to_numpy(float), rtol=1e-12, atol=0.0, equal_nan=True):
+        failures.append(f"daily features differ:\n{single}\n{fanout}")
+
+    print(f"{len(a)} scored records, {len(single)} days")
+    if failures:
+        for msg in failures[:20]:
+            print(f"MISMATCH {msg}")
+        sys.exit(1)
+    print("OK: fan-out matches the single-scope pipeline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Golden-output check for run.py --incremental.
+
+On a seeded synthetic corpus (one posts/comments file pair per day), runs
+--incremental in one workdir with all files, then with only the first half
+(the input set shrinks), then with all files again, and compares each run's
+features_daily / features_hourly / features_close with a full run on the
+same files. Prices come from flat CSVs, so no network is needed.
+
+    python -m bench.check_incremental --days 8
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from bench.synth import SyntheticCorpus
+
+OUTPUTS = ["features_daily.csv", "features_hourly.csv", "features_close.csv"]
+
+def run(files, workdir, args, incremental):
+    cmd = [sys.executable, "run.py", "--raw_posts", *files, "--ticker", "XLE", "--start", args.start,
+           "--end", args.end, "--workdir", workdir, "--config", args.config, "--price_csv_dir", args.prices]
+    if incremental:
+        cmd.append("--incremental")
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+def compare(full_dir, inc_dir):
+    """Names of the outputs that differ."""
+    bad = []
+    for name in OUTPUTS:
+        a, b = os.path.join(full_dir, name), os.path.join(inc_dir, name)
+        if not os.path.exists(a):
+            continue
+        fa, fb = pd.read_csv(a, index_col=0), pd.read_csv(b, index_col=0)
+        if list(fa.index) != list(fb.index) or list(fa.columns) != list(fb.columns) or \
+                not np.allclose(fa.to_numpy(float), fb.to_numpy(float), rtol=1e-12, atol=1e-15, equal_nan=True):
+            bad.append(f"{name} ({len(fa)} rows full vs {len(fb)} incremental)")
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser(description="Check --incremental against full runs as the input set changes")
+    ap.add_argument("--config", default="config/scope_energy.yaml")
+    ap.add_argument("--posts", type=int, default=2000)
+    ap.add_argument("--days", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", default="data/bench/check_incremental")
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    corpus = SyntheticCorpus(cfg, seed=args.seed, days=args.days, posts_per_day=max(1, args.posts // args.days))
+    corpus.write(os.path.join(args.workdir, "raw"))
+    files = sorted(glob.glob(os.path.join(args.workdir, "raw", "*", "*.jsonl")))
+    args.start = corpus.start.strftime("%Y-%m-%d")
+    args.end = (corpus.start + timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+
+    args.prices = os.path.join(args.workdir, "prices")
+    os.makedirs(args.prices)
+    dates = pd.bdate_range(corpus.start.replace(tzinfo=None) - timedelta(days=7), datetime.now())
+    for t in ["XLE"] + list(cfg.get("tickers", [])):
+        pd.DataFrame({"date": dates, "adj_close": 100 + np.arange(len(dates)) * 0.1}).to_csv(
+            os.path.join(args.prices, f"{t}.csv"), index=False)
+
+    first_days = {(corpus.start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(args.days // 2)}
+    half = [f for f in files if os.path.basename(f).split("_", 1)[1][:10] in first_days]
+    inc_dir = os.path.join(args.workdir, "incremental")
+    failures = []
+    for label, subset in (("all files", files), ("first half (shrunk)", half), ("all files again", files)):
+        full_dir = os.path.join(args.workdir, "full")
+        shutil.rmtree(full_dir, ignore_errors=True)
+        run(subset, full_dir, args, incremental=False)
+        run(subset, inc_dir, args, incremental=True)
+        bad = compare(full_dir, inc_dir)
+        print(f"{label:<22}{len(subset):>4} files  {'OK' if not bad else 'MISMATCH ' + ', '.join(bad)}")
+        failures += bad
+    if failures:
+        sys.exit(1)
+    print("OK: incremental runs match full runs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Failure-isolation check for the scoring service.
+
+Submits a good request and a bad one (a record whose num_comments is not a
+number) so they land in the same micro-batch. The bad request must fail on
+its own. The good request's scored records and the running daily features
+must match a service that only ever saw the good request.
+
+    python -m bench.check_service
+"""
+import argparse
+import sys
+
+import numpy as np
+import yaml
+
+from bench.synth import SyntheticCorpus
+from src.service import ScoringService
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that one malformed request does not fail its micro-batch")
+    ap.add_argument("--config", default="config/scope_energy.yaml")
+    ap.add_argument("--posts", type=int, default=300)
+    ap.add_argument("--days", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    corpus = SyntheticCorpus(cfg, seed=args.seed, days=args.days, posts_per_day=max(1, args.posts // args.days))
+    records = list(corpus.records())
+    good, rest = records[:len(records) // 2], records[len(records) // 2:]
+
+    # reference: the good request on its own
+    ref = ScoringService(cfg).start()
+    ref_req = ref.score([dict(r) for r in good], timeout=120)
+    kept = {r["post_id"] for r in ref_req.scored}
+    ref_daily = ref.features("daily")
+    ref.stop()
+
+    # one record that survives filtering and cleaning, then breaks compute_weight
+    bad_rec = dict(next(r for r in good if r["post_id"] in kept), post_id="bad0", num_comments="many")
+    svc = ScoringService(cfg, batch_size=10**6, max_wait_ms=5000).start()
+    good_req = svc.submit([dict(r) for r in good])
+    bad_req = svc.submit([dict(r) for r in rest] + [bad_rec])
+    for req in (good_req, bad_req):
+        req.done.wait(120)
+    daily = svc.features("daily")
+    totals = svc.stats()["totals"]
+    svc.stop()
+
+    failures = []
+    if good_req.error is not None:
+        failures.append(f"good request failed: {good_req.error!r}")
+    elif good_req.batch["requests"] != 2:
+        failures.append(f"requests did not share a batch: {good_req.batch['requests']} in the good request's batch")
+    if bad_req.error is None:
+        failures.append("bad request did not fail")
+    if good_req.scored is not None:
+        if [r["post_id"] for r in good_req.scored] != [r["post_id"] for r in ref_req.scored]:
+            failures.append("good request's scored records differ from scoring it alone")
+        elif any(a["compound"] != b["compound"] or a["weight"] != b["weight"] for a, b in zip(good_req.scored, ref_req.scored)):
+            failures.append("good request's scores / weights differ from scoring it alone")
+    if list(daily.index) != list(ref_daily.index) or \
+            not np.allclose(daily.to_numpy(float), ref_daily.to_numpy(float), rtol=1e-12, atol=0.0, equal_nan=True):
+        failures.append(f"daily features include the failed request:\n{ref_daily}\n{daily}")
+    if totals.get("failed_requests") != 1 or totals.get("failed_batches"):
+        failures.append(f"unexpected totals: {totals}")
+
+    print(f"good: {len(good)} records, {len(kept)} scored; bad: {len(rest) + 1} records -> {bad_req.error!r}")
+    if failures:
+        for msg in failures:
+            print(f"MISMATCH {msg}")
+        sys.exit(1)
+    print("OK: a malformed request fails on its own")
+
+if __name__ == "__main__":
+    main()
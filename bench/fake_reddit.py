@@ -0,0 +1,77 @@
+"""
+Offline stand-in for a PRAW Reddit client, for exercising IngestService
+without network access. Mimics reddit.subreddit(name).search(...) and
+reddit.submission(id=...).comments.replace_more()/slicing, with injected
+per-call latency and optional transient failures.
+"""
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+class FakeComments(list):
+    def replace_more(self, limit=0):
+        return []
+
+class FakeSubreddit:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def search(self, query, limit=10, sort="new", time_filter="day"):
+        self.client._request()
+        rng = random.Random(f"{self.name}/{query}/{self.client.seed}")
+        now = int(time.time())
+        posts = []
+        for _ in range(limit):
+            # small id space per subreddit, so different keywords return overlapping posts
+            pid = f"{self.name[:3]}{rng.randrange(self.client.posts_per_sub):05d}"
+            posts.append(self.client.post(pid, self.name, query, now, rng))
+        return iter(posts)
+
+class FakeReddit:
+    """
+    latency: seconds slept per API call (search or submission fetch).
+    fail_rate: fraction of calls raising ConnectionError (retryable).
+    """
+    def __init__(self, latency=0.05, fail_rate=0.0, posts_per_sub=50, comments_per_post=5, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.posts_per_sub = posts_per_sub
+        self.comments_per_post = comments_per_post
+        self.seed = seed
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def _request(self):
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.fail_rate
+        time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("injected transient failure")
+
+    def post(self, pid, sub, query, now, rng):
+        return SimpleNamespace(
+            id=pid,
+            created_utc=now - rng.randrange(86400),
+            title=f"Thoughts on {query} this week?",
+            selftext=f"Discussion about {query} in r/{sub}.",
+            score=rng.randrange(200),
+            num_comments=rng.randrange(50),
+            url=f"https://www.reddit.com/r/{sub}/comments/{pid}/",
+        )
+
+    def subreddit(self, name):
+        return FakeSubreddit(self, name)
+
+    def submission(self, id):
+        self._request()
+        rng = random.Random(f"{id}/{self.seed}")
+        comments = FakeComments(
+            SimpleNamespace(id=f"{id}c{i}", created_utc=int(time.time()) - rng.randrange(3600),
+                            body=f"comment {i} on {id}", score=rng.randrange(100))
+            for i in range(self.comments_per_post)
+        )
+        return SimpleNamespace(id=id, comments=comments)
@@ -0,0 +1,260 @@
+"""
+Seeded synthetic Reddit corpus in the exact row schema IngestService writes
+(posts_<date>.jsonl / comments_<date>.jsonl under <base>/<scope name>/),
+for benchmarking the pipeline at 1M+ records.
+
+Tunable mix: ticker / company-name / sector-keyword mentions, non-English
+and spam fractions, link posts with no body, URLs / e-mails / quotes / code
+blocks, heavy-tailed scores (some below the score filter) and a diurnal
+timestamp spread over the requested days. Same seed + parameters gives
+byte-identical files.
+
+    python -m bench.synth --posts 1000000 --days 30 --out data/synth
+"""
+import argparse
+import math
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+
+import yaml
+
+from src.storage import JsonlStorage
+
+FILLER = (
+    "the a to of and in is it that for on this with as be at are was have but not what if so my "
+    "they you from by or just about would will can all do there more think some market price week "
+    "year now people going time out up like still long short position shares stock earnings guidance "
+    "quarter dividend yield demand supply production barrel rate inflation fed cut hike report call put "
+    "portfolio sector company growth margin debt buyback outlook forecast analyst trade sell buy "
+    "hold risk cash flow capex pipeline refinery output exports crude prices europe china opec"
+).split()
+
+SENTIMENT = (
+    "good great strong bullish love win gain gains beat best happy confident solid upside rally surge "
+    "bad weak bearish hate loss losses miss worst worried fear crash dump terrible awful downside drop "
+    "risky uncertain disappointed excited optimistic pessimistic"
+).split()
+
+FOREIGN = {
+    "es": "el la de que y en los se del las un por con no una su para es al lo como más pero sus le ya o "
+          "este sí porque esta entre cuando muy sin sobre también me hasta hay donde quien desde todo nos "
+          "durante todos uno les ni contra otros ese eso ante ellos precio mercado acciones petróleo",
+    "de": "der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an "
+          "werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war "
+          "haben nur oder aber vor zur bis mehr durch man Preis Markt Aktien Ölpreis",
+    "fr": "le de un être et à il avoir ne je son que se qui ce dans en du elle au pour pas que vous par "
+          "sur faire plus dire me on mon lui nous comme mais pouvoir avec tout y aller voir en bien où "
+          "sans tu ou leur homme si deux marché prix actions pétrole",
+    "pt": "o de a e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele das "
+          "tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre "
+          "mercado preço ações petróleo",
+}
+FOREIGN = {lang: words.split() for lang, words in FOREIGN.items()}
+
+SPAM = [
+    "Click here for FREE shares {url}",
+    "Buy now!!! Limited offer!!! Don't miss out!!!",
+    "{url}",
+    "subscribe to my channel for daily picks {url}",
+    "Massive gains!!!!!! Join today!!!!!!",
+]
+
+NOISE = [
+    "see https://www.reuters.com/markets/commodities/{word}-{n}",
+    "source: www.bloomberg.com/news/{word}",
+    "dm me at trader{n}@example.com",
+    "\n> {word} {word2} {word3}\n",
+    "`{word}`",
+    "\n```\n{word} = {n}\nprint({word})\n```\n",
+]
+
+# Reddit activity by UTC hour: quiet overnight in the US, peaking around the US session
+HOUR_WEIGHTS = [3, 2, 2, 1, 1, 1, 1, 2, 3, 4, 5, 6, 7, 9, 10, 10, 10, 9, 8, 7, 6, 5, 4, 3]
+
+def base36(n: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if n == 0:
+            return out
+
+class SyntheticCorpus:
+    """
+    posts_per_day posts per UTC day for `days` days from `start`; each post
+    gets up to cfg["top_comments"] comments with probability comment_rate.
+    Fractions are per post (or comment) and drawn independently.
+    """
+    def __init__(self, cfg: dict, seed: int = 0, start: str = "2025-01-01", days: int = 30,
+                 posts_per_day: int = 1000, comment_rate: float = 0.6, non_english: float = 0.05,
+                 spam: float = 0.03, link_post: float = 0.25, mention: float = 0.15, keyword: float = 0.5,
+                 noise: float = 0.15):
+        self.cfg = cfg
+        self.seed = seed
+        self.start = datetime.strptime(start, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        self.days = days
+        self.posts_per_day = posts_per_day
+        self.comment_rate = comment_rate
+        self.non_english = non_english
+        self.spam = spam
+        self.link_post = link_post
+        self.mention = mention
+        self.keyword = keyword
+        self.noise = noise
+        self.top_comments = cfg.get("top_comments", 3)
+        # mentions as people write them: $XOM, XOM, Exxon, chevron ...
+        tickers = list(cfg.get("tickers", []))
+        names = list(cfg.get("name_map", {}))
+        self.mentions = [f"${t}" for t in tickers] + tickers + [n.title() for n in names] + names
+        self.keywords = list(cfg.get("keywords", []))
+        self.subreddits = list(cfg.get("subreddits", ["stocks"]))
+        self.counts = {"posts": 0, "comments": 0, "non_english": 0, "spam": 0, "link_posts": 0}
+
+    # --- text ---------------------------------------------------------------
+
+    def _n_words(self, rng: random.Random, median: float, sigma: float, cap: int) -> int:
+        return max(1, min(cap, int(rng.lognormvariate(math.log(median), sigma))))
+
+    def _english(self, rng: random.Random, n: int) -> str:
+        words = rng.choices(FILLER, k=n)
+        for _ in range(max(1, n // 12)): # ~1 in 12 words carries sentiment
+            words[rng.randrange(n)] = rng.choice(SENTIMENT)
+        if self.mentions and rng.random() < self.mention:
+            words.insert(rng.randrange(n + 1), rng.choice(self.mentions))
+        if self.keywords and rng.random() < self.keyword:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(self.keywords))
+        if rng.random() < self.noise:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(NOISE).format(
+                word=rng.choice(FILLER), word2=rng.choice(FILLER), word3=rng.choice(FILLER), n=rng.randrange(1000)))
+        # sentences of 8-20 words
+        out, i = [], 0
+        while i < len(words):
+            k = rng.randint(8, 20)
+            sentence = " ".join(words[i:i + k])
+            out.append(sentence[:1].upper() + sentence[1:] + rng.choice(".....?!"))
+            i += k
+        return " ".join(out)
+
+    def _foreign(self, rng: random.Random, n: int) -> str:
+        return " ".join(rng.choices(FOREIGN[rng.choice(sorted(FOREIGN))], k=max(n, 6)))
+
+    def _spam(self, rng: random.Random) -> str:
+        return rng.choice(SPAM).format(url=f"https://promo{rng.randrange(100)}.example.com/r/{rng.randrange(10**6)}")
+
+    def _body(self, rng: random.Random, median: float, sigma: float, cap: int) -> str:
+        n = self._n_words(rng, median, sigma, cap)
+        r = rng.random()
+        if r < self.spam:
+            self.counts["spam"] += 1
+            return self._spam(rng)
+        if r < self.spam + self.non_english:
+            self.counts["non_english"] += 1
+            return self._foreign(rng, n)
+        return self._english(rng, n)
+
+    # --- rows ---------------------------------------------------------------
+
+    def _timestamp(self, rng: random.Random, day_start: int) -> int:
+        hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        return day_start + hour * 3600 + rng.randrange(3600)
+
+    def _score(self, rng: random.Random, median: float) -> int:
+        return int(rng.lognormvariate(math.log(median), 1.3)) # heavy tail; ~25% of posts below 5
+
+    def day_rows(self, day: int):
+        """(posts, comments) for day index `day`; each day has its own seeded stream."""
+        rng = random.Random(f"{self.seed}/{day}")
+        day_start = int((self.start + timedelta(days=day)).timestamp())
+        ingested = day_start + 86400
+        scope = self.cfg.get("name", "synthetic")
+        posts, comments = [], []
+        for i in range(self.posts_per_day):
+            pid = base36(36 ** 6 + (day * self.posts_per_day + i) * 7919 + self.seed) # unique, reddit-like
+            sub = rng.choice(self.subreddits)
+            created = self._timestamp(rng, day_start)
+            title = self._body(rng, median=10, sigma=0.4, cap=40)
+            if rng.random() < self.link_post:
+                selftext = ""
+                self.counts["link_posts"] += 1
+            else:
+                selftext = self._body(rng, median=70, sigma=0.9, cap=2000)
+            n_comments = self.top_comments if rng.random() < self.comment_rate else 0
+            posts.append({
+                "post_id": pid,
+                "subreddit": sub,
+                "created_utc": created,
+                "title": title,
+                "selftext": selftext,
+                "score": self._score(rng, 12),
+                "num_comments": n_comments + int(rng.expovariate(1 / 30)),
+                "url": f"https://www.reddit.com/r/{sub}/comments/{pid}/",
+                "keyword_matched": rng.choice(self.keywords) if self.keywords else "",
+                "scope_name": scope,
+                "ingested_at_utc": ingested,
+                "is_comment": False,
+            })
+            for rank in range(1, n_comments + 1):
+                comments.append({
+                    "post_id": pid,
+                    "comment_id": f"{pid}{base36(rank)}",
+                    "created_utc": created + int(rng.expovariate(1 / 1800)), # minutes to hours after the post
+                    "comment_text": self._body(rng, median=20, sigma=1.0, cap=600),
+                    "comment_score": self._score(rng, 6),
+                    "rank": rank,
+                    "scope_name": scope,
+                    "ingested_at_utc": ingested,
+                    "is_comment": True,
+                })
+        self.counts["posts"] += len(posts)
+        self.counts["comments"] += len(comments)
+        return posts, comments
+
+    def records(self) -> Iterator[Dict]:
+        """All rows, day by day: that day's posts, then its comments."""
+        for day in range(self.days):
+            posts, comments = self.day_rows(day)
+            yield from posts
+            yield from comments
+
+    def write(self, base_dir: str) -> List[str]:
+        """Write per-day posts/comments files like Repository does; returns the file paths."""
+        storage = JsonlStorage(ensure_ascii=True) # Repository's raw-data format
+        outdir = os.path.join(base_dir, self.cfg.get("name", "synthetic"))
+        os.makedirs(outdir, exist_ok=True)
+        paths = []
+        for day in range(self.days):
+            today = (self.start + timedelta(days=day)).strftime("%Y-%m-%d")
+            posts, comments = self.day_rows(day)
+            for kind, rows in (("posts", posts), ("comments", comments)):
+                path = storage.path(os.path.join(outdir, f"{kind}_{today}"))
+                with storage.writer(path) as out:
+                    for row in rows:
+                        out.write(row)
+                paths.append(path)
+        return paths
+
+def main():
+    ap = argparse.ArgumentParser(description="Write a seeded synthetic Reddit corpus in the ingest schema")
+    ap.add_argument("--config", default="config/scope_energy.yaml")
+    ap.add_argument("--out", default="data/synth")
+    ap.add_argument("--posts", type=int, default=100_000, help="Total posts (comments come on top)")
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--start", default="2025-01-01")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--non_english", type=float, default=0.05)
+    ap.add_argument("--spam", type=float, default=0.03)
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    corpus = SyntheticCorpus(cfg, seed=args.seed, start=args.start, days=args.days,
+                             posts_per_day=max(1, args.posts // args.days),
+                             non_english=args.non_english, spam=args.spam)
+    paths = corpus.write(args.out)
+    print(f"{len(paths)} files under {os.path.dirname(paths[0])}: {corpus.counts}")
+
+if __name__ == "__main__":
+    main()
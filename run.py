@@ -3,12 +3,147 @@ import os
 import yaml
 
 from src.clean import Cleaner
-from src.features import FeatureProcessor
-from src.market import fetch_prices, make_forward_returns
-from src.evaluate import evaluate
+from src.features import FeatureProcessor, DailyAccumulator
+from src.market import fetch_prices, make_forward_returns, PriceStore, CsvProvider
+from src.evaluate import evaluate, evaluate_universe
+from src.cache import ResultCache
+from src.storage import get_storage, STORAGES
+from src.fanout import build_corpus, ScopeRunner
+from src.instrument import RunReport
+from src.windows import WindowedFeatures
+from src.manifest import Manifest, config_fingerprint, partition_name
 from src.utils import to_epoch_seconds, combine_jsonl
 import pandas as pd
 
+PROFILE_STAGES = ["combine", "row_filtering", "text_construction", "process_file", "aggregate_daily",
+                  "build_corpus", "scope", "fetch_prices", "evaluate"]
+
+def drop_counts(counts, exclude=()):
+    return {k[len("drop_"):]: v for k, v in sorted(counts.items()) if k.startswith("drop_") and k[len("drop_"):] not in exclude}
+
+def score_file(raw_path, clean_out, scored_out, cleaner, feats, start_ts, end_ts, args, report):
+    """clean -> score one raw JSONL file; returns the number of scored records"""
+    before = cleaner.counts.copy()
+    with report.stage("text_construction") as st:
+        rf, records = report.timed("row_filtering", cleaner.row_filtering(raw_path, start_ts, end_ts, workers=args.workers))
+        n_clean = st.records_out = cleaner.text_construction(records, clean_out)
+        st.records_in = rf.records_out
+    counts = cleaner.counts - before
+    rf.records_in = counts["lines_read"]
+    rf.extra["drops"] = drop_counts(counts, exclude=("spam",)) # spam is dropped later, in text_construction
+    st.extra["drops"] = {"spam": counts["drop_spam"]}
+
+    with report.stage("process_file") as st:
+        st.records_in = n_clean
+        if args.columnar:
+            st.records_out = feats.process_file_columnar(clean_out, scored_out)
+        else:
+            st.records_out = feats.process_file(clean_out, scored_out)
+    return st.records_out
+
+def make_windows(cfg):
+    """WindowedFeatures for the config's windows section, or None when it has none"""
+    return WindowedFeatures.from_config(cfg) if cfg.get("windows") else None
+
+def write_windows(windows, outdir, args):
+    """features_hourly.csv (UTC hours) and features_close.csv (per trading day close) within --start/--end"""
+    hourly = windows.hourly()
+    hourly = hourly[(hourly.index >= pd.Timestamp(args.start)) & (hourly.index < pd.Timestamp(args.end) + pd.Timedelta(days=1))]
+    hourly.to_csv(os.path.join(outdir, "features_hourly.csv"), index=True)
+    close = windows.at_close()
+    close = close[(close.index >= pd.Timestamp(args.start)) & (close.index <= pd.Timestamp(args.end))]
+    close.to_csv(os.path.join(outdir, "features_close.csv"), index=True)
+
+def run_incremental(args, cfg, cleaner, feats, storage, features_out, report):
+    """
+    Process only raw files that are new or changed since the last run (per the manifest),
+    keep one partition (clean/scored data + daily and hourly sums) per input file, and rebuild
+    features_daily.csv (and the windowed features) by merging the sums of the partitions of
+    the files passed this time; partitions of earlier inputs are kept but not merged.
+    Partitions are cleaned without a date window; --start/--end are applied to the
+    merged daily sums and hour buckets before features are built, so rolling windows and
+    decayed indices see the same records as a full run (the window is whole UTC days,
+    so no day or hour straddles it).
+    """
+    manifest = Manifest(os.path.join(args.workdir, "manifest.json"))
+    fingerprint = config_fingerprint(cfg, args.storage)
+    if manifest.fingerprint != fingerprint:
+        print("[incremental] config changed or no manifest, rebuilding all partitions")
+        manifest.reset(fingerprint)
+
+    part_root = os.path.join(args.workdir, "partitions")
+    for raw_path in args.raw_posts:
+        if manifest.is_current(raw_path):
+            continue
+        name = partition_name(raw_path)
+        part_dir = os.path.join(part_root, name)
+        os.makedirs(part_dir, exist_ok=True)
+        clean_out = storage.path(os.path.join(part_dir, "clean_posts"))
+        scored_out = storage.path(os.path.join(part_dir, "scored_posts"))
+        n = score_file(raw_path, clean_out, scored_out, cleaner, feats, 0, 2**63 - 1, args, report)
+        with report.stage("aggregate_daily") as st:
+            st.records_in = n
+            windows = make_windows(cfg)
+            feats.accumulate_daily(scored_out, allow_empty=True, windows=windows).save(os.path.join(part_dir, "daily_sums.csv"))
+            if windows is not None:
+                windows.save(os.path.join(part_dir, "hourly_sums.csv"))
+        manifest.record(raw_path, name)
+        manifest.save() # after every partition, so an interrupted run keeps finished work
+        print(f"[incremental] processed {raw_path} -> {name}")
+    manifest.save()
+
+    # only this run's inputs, like a full run; partitions of files not passed now stay on disk for reuse
+    names = [manifest.partition(raw_path) for raw_path in args.raw_posts]
+    with report.stage("merge_partitions") as st:
+        acc = DailyAccumulator()
+        for name in names:
+            acc.merge(DailyAccumulator.load(os.path.join(part_root, name, "daily_sums.csv")))
+        out = acc.to_features()
+        out = out[(out.index >= pd.Timestamp(args.start)) & (out.index <= pd.Timestamp(args.end))]
+        out.to_csv(features_out, index=True)
+        st.records_in, st.records_out = len(names), len(out)
+
+        windows = make_windows(cfg)
+        if windows is not None:
+            for name in names:
+                windows.load(os.path.join(part_root, name, "hourly_sums.csv"))
+            # a full run never sees records outside --start/--end, so neither may the windows
+            windows.trim(to_epoch_seconds(args.start), to_epoch_seconds(args.end) + (24 * 3600 - 1))
+            write_windows(windows, args.workdir, args)
+
+def evaluate_scope(args, cfg, price_store, outdir, report):
+    """returns -> evaluate (and --universe) for one scope's features_daily.csv in outdir"""
+    features_out = os.path.join(outdir, "features_daily.csv")
+    returns_out = os.path.join(outdir, "returns_daily.csv")
+    eval_out = os.path.join(outdir, "joined_and_corr.csv")
+
+    with report.stage(f"fetch_prices:{cfg['name']}") as st:
+        prices = fetch_prices(args.ticker, args.start, args.end, store=price_store)
+        rets = make_forward_returns(prices)
+        rets.to_csv(returns_out)
+        st.records_out = len(rets)
+
+    with report.stage(f"evaluate:{cfg['name']}"):
+        evaluate(features_out, returns_out, eval_out)
+
+    if args.universe:
+        universe = list(dict.fromkeys(cfg.get("tickers", []) + cfg.get("sector_etfs", []) + [args.ticker]))
+        with report.stage(f"fetch_prices:{cfg['name']}:universe") as st:
+            wide = price_store.get_prices(universe, args.start, args.end)
+            make_forward_returns(wide, horizons=args.horizons).to_csv(os.path.join(outdir, "returns_universe.csv"))
+            st.records_out = wide.size
+        with report.stage(f"evaluate:{cfg['name']}:universe") as st:
+            table = evaluate_universe(features_out, os.path.join(outdir, "returns_universe.csv"),
+                                      os.path.join(outdir, "eval_universe.csv"), lags=args.lags)
+            st.records_out = len(table)
+        print(f"\n=== Universe ({cfg.get('name')}): {len(universe)} tickers x {len(args.horizons)} horizons x {len(args.lags)} lags ===")
+        print(table.sort_values("p_value").head(10).to_string(index=False))
+
+    joined = pd.read_csv(eval_out, index_col=0, parse_dates=True)
+    corr_row = joined.tail(1)
+    print(f"\n=== Evaluation ({cfg.get('name')}) ===")
+    print(corr_row)
+
 def main():
     ap = argparse.ArgumentParser(description="End-to-end runner: clean -> score -> aggregate -> returns -> evaluate")
     ap.add_argument("--raw_posts", required=True, nargs="+", help="One or more raw JSONL files (posts/comments)")    
@@ -16,45 +151,109 @@ def main():
     ap.add_argument("--start", required=True, help="Start date (YYYY-MM-DD) for cleaning/returns")
     ap.add_argument("--end", required=True, help="End date (YYYY-MM-DD) for cleaning/returns")
     ap.add_argument("--workdir", default="data/work", help="Directory to write intermediate outputs")
+    ap.add_argument("--config", nargs="+", default=["config/scope_energy.yaml"],
+                    help="One or more scope configs; with several, text is cleaned and scored once and fanned out per scope")
+    ap.add_argument("--workers", type=int, default=1, help="Processes for language detection (1 = inline)")
+    ap.add_argument("--storage", default="jsonl", choices=sorted(STORAGES), help="Work-directory format for clean/scored data")
+    ap.add_argument("--columnar", action="store_true", help="Score in DataFrame chunks with vectorised weights")
+    ap.add_argument("--incremental", action="store_true", help="Only process new/changed raw files (tracked in manifest.json)")
+    ap.add_argument("--price_csv_dir", default=None, help="Read prices from <dir>/<TICKER>.csv instead of yfinance")
+    ap.add_argument("--universe", action="store_true", help="Also evaluate every config ticker + sector ETF at several horizons/lags")
+    ap.add_argument("--horizons", type=int, nargs="+", default=[1, 5, 20], help="Forward-return horizons (days) for --universe")
+    ap.add_argument("--lags", type=int, nargs="+", default=[0, 1, 2, 3, 4, 5], help="Feature lags (trading days) for --universe")
+    ap.add_argument("--profile", nargs="+", default=[], choices=PROFILE_STAGES, metavar="STAGE",
+                    help=f"Run these stages under cProfile and dump stats to the workdir ({', '.join(PROFILE_STAGES)})")
+    ap.add_argument("--no_cache", action="store_true", help="Disable the on-disk language/sentiment result cache")
+    ap.add_argument("--cache_max_entries", type=int, default=2_000_000, help="Max cached results kept (LRU eviction)")
     args = ap.parse_args()
+    if args.incremental and len(args.config) > 1:
+        ap.error("--incremental supports a single --config")
 
     os.makedirs(args.workdir, exist_ok=True)
+    report = RunReport(args.workdir, profile_stages=args.profile)
 
-    clean_out = os.path.join(args.workdir, "clean_posts.jsonl")
-    scored_out = os.path.join(args.workdir, "scored_posts.jsonl")
-    features_out = os.path.join(args.workdir, "features_daily.csv")
-    returns_out = os.path.join(args.workdir, "returns_daily.csv")
-    eval_out = os.path.join(args.workdir, "joined_and_corr.csv")
-
+    storage = get_storage(args.storage)
     start_ts = to_epoch_seconds(args.start)
     end_ts = to_epoch_seconds(args.end) + (24 * 3600 - 1)
 
-    with open("config/scope_energy.yaml") as f:
-        cfg = yaml.safe_load(f)
-
-    cleaner = Cleaner(cfg)
-    feats = FeatureProcessor(cfg)
+    cfgs = []
+    for path in args.config:
+        with open(path) as f:
+            cfgs.append(yaml.safe_load(f))
+    backends = {cfg.get("sentiment_backend", "vader") for cfg in cfgs}
+    if len(backends) > 1:
+        ap.error(f"--config files must use the same sentiment_backend, got {sorted(backends)}")
+    backend = backends.pop() # the shared corpus is scored once, for all scopes
 
+    cache = None if args.no_cache else ResultCache(os.path.join(args.workdir, "result_cache.sqlite"), max_entries=args.cache_max_entries)
     combined_in = os.path.join(args.workdir, "raw_combined.jsonl")
-    combine_jsonl(args.raw_posts, combined_in)
 
-    records = cleaner.row_filtering(combined_in, start_ts, end_ts)
-    cleaner.text_construction(records, clean_out)
+    if len(cfgs) == 1:
+        cfg = cfgs[0]
+        clean_out = storage.path(os.path.join(args.workdir, "clean_posts"))
+        scored_out = storage.path(os.path.join(args.workdir, "scored_posts"))
+        features_out = os.path.join(args.workdir, "features_daily.csv")
+        cleaner = Cleaner(cfg, cache=cache, storage=storage)
+        feats = FeatureProcessor(cfg, cache=cache, storage=storage)
 
-    # Only call once
-    feats.process_file(clean_out, scored_out)
-    feats.aggregate_daily(scored_out, features_out)
+        if args.incremental:
+            run_incremental(args, cfg, cleaner, feats, storage, features_out, report)
+        else:
+            with report.stage("combine"):
+                combine_jsonl(args.raw_posts, combined_in)
 
-    prices = fetch_prices(args.ticker, args.start, args.end)
-    rets = make_forward_returns(prices)
-    rets.to_csv(returns_out)
+            # Only call once
+            n = score_file(combined_in, clean_out, scored_out, cleaner, feats, start_ts, end_ts, args, report)
+            with report.stage("aggregate_daily") as st:
+                st.records_in = n
+                windows = make_windows(cfg)
+                st.records_out = len(feats.aggregate_daily(scored_out, features_out, windows=windows))
+                if windows is not None:
+                    write_windows(windows, args.workdir, args)
+        scope_dirs = [args.workdir]
+    else:
+        # Scope-independent stages once -> shared scored corpus, then cheap per-scope fan-out
+        with report.stage("combine"):
+            combine_jsonl(args.raw_posts, combined_in)
+        corpus_out = storage.path(os.path.join(args.workdir, "scored_corpus"))
+        with report.stage("build_corpus") as st:
+            shared = Cleaner({}, cache=cache, storage=storage)
+            scorer = FeatureProcessor({"sentiment_backend": backend}, cache=cache, storage=storage)
+            n_corpus = st.records_out = build_corpus(combined_in, corpus_out, start_ts, end_ts, shared, scorer,
+                                                     workers=args.workers)
+            st.records_in = shared.counts["lines_read"]
+            st.extra["drops"] = drop_counts(shared.counts)
+        scope_dirs = []
+        for cfg in cfgs:
+            scope_dir = os.path.join(args.workdir, cfg["name"])
+            os.makedirs(scope_dir, exist_ok=True)
+            with report.stage(f"scope:{cfg['name']}") as st:
+                st.records_in = n_corpus
+                windows = make_windows(cfg)
+                acc = ScopeRunner(cfg, storage=storage).run(corpus_out, os.path.join(scope_dir, "features_daily.csv"),
+                                                            scored_out=storage.path(os.path.join(scope_dir, "scored_posts")),
+                                                            windows=windows)
+                if windows is not None:
+                    write_windows(windows, scope_dir, args)
+                st.records_out = int(acc.sums["n"].sum()) if not acc.sums.empty else 0
+                st.extra["days"] = len(acc.sums)
+            scope_dirs.append(scope_dir)
 
-    evaluate(features_out, returns_out, eval_out)
+    if cache is not None:
+        cache.close()
+        for ns, c in cache.stats().items():
+            print(f"[cache] {ns}: {c['hits']} hits, {c['misses']} misses")
 
-    joined = pd.read_csv(eval_out, index_col=0, parse_dates=True)
-    corr_row = joined.tail(1)
-    print("\n=== Evaluation ===")
-    print(corr_row)
+    # Local price store: only date ranges not fetched before go to the provider
+    provider = CsvProvider(args.price_csv_dir) if args.price_csv_dir else None
+    price_store = PriceStore(os.path.join(args.workdir, "prices.sqlite"), provider)
+    for cfg, outdir in zip(cfgs, scope_dirs):
+        evaluate_scope(args, cfg, price_store, outdir, report)
+    price_store.close()
+
+    path = report.write()
+    print(f"\n=== Run report ({path}) ===")
+    print(report.summary())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
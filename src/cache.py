@@ -0,0 +1,102 @@
+import hashlib
+import json
+import sqlite3
+import time
+from importlib.metadata import version, PackageNotFoundError
+from typing import Dict, List, Optional
+
+def package_version(name: str) -> str:
+    """Installed version of a package, used to invalidate cached results on upgrade."""
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+class ResultCache:
+    """
+    Persistent content-hash cache (SQLite) for expensive per-text results,
+    e.g. language detection and VADER scores.
+    Keys are sha1(namespace + version + text); values are stored as JSON.
+    Least recently used entries are evicted once max_entries is exceeded.
+    """
+    def __init__(self, path: str, max_entries: int = 2_000_000, batch_size: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)")
+        self.now = int(time.time())
+        self._writes = [] # pending inserts, flushed in batches
+        self._touched = [] # keys hit this run, last_used refreshed on flush
+        self.counters = {}
+
+    @staticmethod
+    def make_key(namespace: str, version: str, text: str) -> str:
+        h = hashlib.sha1()
+        h.update(f"{namespace}\x00{version}\x00".encode("utf-8"))
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def _count(self, namespace: str, hits: int, misses: int) -> None:
+        c = self.counters.setdefault(namespace, {"hits": 0, "misses": 0})
+        c["hits"] += hits
+        c["misses"] += misses
+
+    def get_many(self, namespace: str, version: str, texts: List[str]) -> List[Optional[object]]:
+        """Look up several texts at once; missing entries come back as None."""
+        keys = [self.make_key(namespace, version, t) for t in texts]
+        found = {}
+        for i in range(0, len(keys), 900): # stay under SQLite's bound-parameter limit
+            part = keys[i:i + 900]
+            marks = ",".join("?" * len(part))
+            for key, value in self.conn.execute(f"SELECT key, value FROM results WHERE key IN ({marks})", part):
+                found[key] = json.loads(value)
+        self._touched.extend(found)
+        values = [found.get(k) for k in keys]
+        hits = sum(v is not None for v in values)
+        self._count(namespace, hits, len(values) - hits)
+        if len(self._touched) >= self.batch_size:
+            self.flush()
+        return values
+
+    def get(self, namespace: str, version: str, text: str) -> Optional[object]:
+        return self.get_many(namespace, version, [text])[0]
+
+    def put(self, namespace: str, version: str, text: str, value) -> None:
+        self._writes.append((self.make_key(namespace, version, text), json.dumps(value), self.now))
+        if len(self._writes) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.conn:
+            if self._writes:
+                self.conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", self._writes)
+            if self._touched:
+                self.conn.executemany("UPDATE results SET last_used = ? WHERE key = ?", [(self.now, k) for k in self._touched])
+        self._writes = []
+        self._touched = []
+
+    def evict(self) -> int:
+        """Drop least recently used rows beyond max_entries; returns rows removed."""
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        excess = n - self.max_entries
+        if excess <= 0:
+            return 0
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,)
+            )
+        return excess
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {ns: dict(c) for ns, c in self.counters.items()}
+
+    def close(self) -> None:
+        self.flush()
+        self.evict()
+        self.conn.close()
@@ -1,105 +1,316 @@
-import pandas as pd
-from langdetect import detect
+from langdetect import detect, DetectorFactory
 import json
 import re
-from typing import List
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple
 from langdetect.lang_detect_exception import LangDetectException
+from src.cache import package_version
+from src.storage import JsonlStorage
+
+LANGDETECT_SEED = 0 # langdetect is non-deterministic unless seeded
+
+def _seed_langdetect():
+    DetectorFactory.seed = LANGDETECT_SEED
+
+def is_english(text: str) -> bool:
+    try:
+        return detect(text) == "en"
+    except LangDetectException:
+        return False # skip if detection fails
+
+def detect_english_batch(texts: List[str]) -> List[bool]:
+    """Worker entry point: language-check a chunk of texts."""
+    return [is_english(t) for t in texts]
+
+def _chunked(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+class NormalizedText(NamedTuple):
+    text: str          # cleaned text (what regex_filtering returned)
+    lower: str         # text.lower()
+    n_words: int       # len(text.split())
+    n_urls: int        # URLs wrapped in <>
+    n_emails: int      # email addresses wrapped in <>
+    is_spam: bool
+
+class TextNormalizer:
+    """
+    Compiled-once replacement for regex_filtering + is_spam.
+    The substitutions run in the same order as before (each depends on the previous
+    one's output), but passes whose trigger character is absent are skipped, and the
+    lowercase form, word count and spam checks are computed once from the result.
+    """
+    EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+    SPACES_RE = re.compile(r"\s{2,}")
+    URL_RE = re.compile(r"(https?://[^\s]+|www\.[^\s]+)")
+    QUOTE_RE = re.compile(r"^>.*$", flags=re.MULTILINE)
+    CODE_BLOCK_RE = re.compile(r"```.*?```", flags=re.DOTALL)
+    INLINE_CODE_RE = re.compile(r"`[^`]+`")
+    LINK_RE = re.compile(r"(https?://[^\s]+)")
+    SPAM_KEYWORDS = ["buy now", "free", "click here", "subscribe", "visit", "offer"]
+    SPAM_RE = re.compile("|".join(map(re.escape, SPAM_KEYWORDS)))
+
+    def normalize(self, raw: str) -> NormalizedText:
+        text, n_emails, n_urls = raw, 0, 0
+        if "@" in text:
+            text, n_emails = self.EMAIL_RE.subn(r"<\g<0>>", text) # puts <> around email addresses
+        text = self.SPACES_RE.sub(" ", text) # removes repeated spaces
+        if "://" in text or "www." in text:
+            text, n_urls = self.URL_RE.subn(r"<\g<0>>", text) # puts <> around URL
+        if ">" in text:
+            text = self.QUOTE_RE.sub("", text) # Remove blockquotes at the start of a line (> something)
+        if "`" in text:
+            text = self.CODE_BLOCK_RE.sub("", text) # Remove code blocks wrapped in triple backticks (```...```)
+            text = self.INLINE_CODE_RE.sub("", text) # Remove inline code wrapped in single backticks (`...`)
+
+        lower = text.lower()
+        n_words = len(text.split())
+        return NormalizedText(text, lower, n_words, n_urls, n_emails, self.spam_verdict(text, lower, n_words))
+
+    def spam_verdict(self, text: str, lower: str, n_words: int) -> bool:
+        if self.SPAM_RE.search(lower):
+            return True
+        if n_words <= 3 and "://" in text and self.LINK_RE.search(text):  # only link
+            return True
+        if text.count("!") > 5:
+            return True
+        return False
+
+class EntityMatcher:
+    """
+    Precompiled ticker / company-name / sector-keyword matcher, built once per scope.
+    Gives the same results as one re.search per name_map entry, in a single scan.
+    """
+    def __init__(self, tickers: Iterable[str], name_map: Dict[str, str], sector_keys: List[str]):
+        # Only tickers that the original \b\$?([A-Z]{1,5})\b pattern could ever capture
+        syms = sorted((t for t in set(tickers) if re.fullmatch(r"[A-Z]{1,5}", t)), key=len, reverse=True)
+        self.sym_re = re.compile(r"\b(" + "|".join(syms) + r")\b") if syms else None
+
+        # Longest name first, so the alternation reports the longest name starting at each position.
+        # Zero-width lookahead lets matches overlap, e.g. "shell" inside "royal dutch shell".
+        self.name_map = dict(name_map)
+        names = sorted(self.name_map, key=len, reverse=True)
+        self.name_re = re.compile(r"(?=\b(" + "|".join(map(re.escape, names)) + r")\b)") if names else None
+        # Shorter names that are prefixes of a longer one can match at the same position
+        self.prefixes = {
+            n: [(re.compile(re.escape(m) + r"\b"), m) for m in names if m != n and n.startswith(m)]
+            for n in names
+        }
+
+        self.sector_keys = list(sector_keys)
+        self.key_re = re.compile("|".join(map(re.escape, self.sector_keys))) if self.sector_keys else None
+
+    def extract_tickers(self, text: str) -> List[str]:
+        """Sorted tickers for every symbol and company-name mention in text."""
+        found = set()
+        if self.sym_re is not None:
+            found.update(self.sym_re.findall(text))
+        if self.name_re is not None:
+            low = text.lower()
+            for m in self.name_re.finditer(low):
+                name, pos = m.group(1), m.start()
+                found.add(self.name_map[name])
+                for pat, short in self.prefixes[name]:
+                    if pat.match(low, pos):
+                        found.add(self.name_map[short])
+        return sorted(found)
+
+    def has_keyword(self, low_text: str) -> bool:
+        return self.key_re is not None and self.key_re.search(low_text) is not None
 
 class Cleaner:
-    def __init__(self, cfg: dict):
+    LANG_NAMESPACE = "langdetect"
+
+    def __init__(self, cfg: dict, cache=None, storage=None):
+        self.storage = storage if storage is not None else JsonlStorage() # work-directory file format
+        self.cache = cache # optional ResultCache, skips detection for texts seen in earlier runs
+        self.lang_version = f"{package_version('langdetect')}:seed={LANGDETECT_SEED}"
         self.tickers = set(cfg.get("tickers", []))
         self.name_map = {k.lower(): v for k, v in cfg.get("name_map", {}).items()}  # ensure key matches YAML
         self.sector_keys = [k.lower() for k in cfg.get("keywords", [])]
+        self.matcher = EntityMatcher(self.tickers, self.name_map, self.sector_keys) # compiled once per scope
+        self.normalizer = TextNormalizer()
+        self.counts = Counter() # lines read / records kept / drops per filter reason, for run reports
 
     def extract_tickers(self, text: str) -> List[str]:
-        syms = set()
-        for sym in re.findall(r"\b\$?([A-Z]{1,5})\b", text):
-            if sym in self.tickers:
-                syms.add(sym)           
+        return self.matcher.extract_tickers(text) # returns sorted list
 
-        low = text.lower()
-        for name, sym in self.name_map.items():
-            if re.search(rf"\b{re.escape(name)}\b", low): # re.escape ensures that any regex characters are treated literally
-                syms.add(sym)
-        return sorted(syms) # returns sorted list
+    def cheap_filtering(self, record: dict, start_ts: int, end_ts: int):
+        """
+        Run the inexpensive per-record checks (window, post_id, text, score).
+        Returns the text to language-check, or None if the record is dropped.
+        """
+        # Checks ordered cheap -> expensive
+        created_utc = int(record.get("created_utc")) # seconds since Unix epoch
+        if created_utc is None or not (start_ts <= created_utc <= end_ts): 
+            self.counts["drop_out_of_window"] += 1
+            return None
 
-    def row_filtering(self, file_path: str, start_ts: int, end_ts: int):
+        post_id_ok = bool(str(record.get("post_id","")).strip())
+        if not post_id_ok:
+            self.counts["drop_no_post_id"] += 1
+            return None
 
+        title_ok = bool(str(record.get("title","")).strip())
+        body_ok  = bool(str(record.get("selftext","")).strip())
+        if not (title_ok or body_ok):
+            self.counts["drop_empty_text"] += 1
+            return None
+
+        if record.get("score", 0) < 5: #checks has >= 5 upvotes
+            self.counts["drop_low_score"] += 1
+            return None
+
+        text = " ".join([record.get("title",""), record.get("selftext","")]).strip()
+        if not text:
+            self.counts["drop_empty_text"] += 1
+            return None
+        return text
+
+    def read_records(self, file_path: str, start_ts: int, end_ts: int):
+        """Yield (record, text) pairs that pass the cheap checks."""
         with open(file_path, "r") as fin:
             for line in fin:
                 if not line.strip(): # checks if line is empty or just whitespace
                     continue
+                self.counts["lines_read"] += 1
                 try:
                     record = json.loads(line)
                 except json.JSONDecodeError:
+                    self.counts["drop_bad_json"] += 1
                     continue
-                # Checks ordered cheap -> expensive
-                created_utc = int(record.get("created_utc")) # seconds since Unix epoch
-                if created_utc is None or not (start_ts <= created_utc <= end_ts): 
+                text = self.cheap_filtering(record, start_ts, end_ts)
+                if text is None:
                     continue
+                yield record, text
 
-                post_id_ok = bool(str(record.get("post_id","")).strip())
-                if not post_id_ok:
-                    continue
+    def row_filtering(self, file_path: str, start_ts: int, end_ts: int, workers: int = 1, chunk_size: int = 500):
+        """
+        Yield records in the date window that pass the cheap checks and are English.
+        With workers > 1 language detection runs in a process pool on chunks
+        of chunk_size records; output order matches the input file.
+        """
+        DetectorFactory.seed = LANGDETECT_SEED
+        pairs = self.read_records(file_path, start_ts, end_ts)
+        if workers <= 1:
+            for chunk in _chunked(pairs, chunk_size):
+                yield from self._english_inline(chunk)
+            return
 
-                title_ok = bool(str(record.get("title","")).strip())
-                body_ok  = bool(str(record.get("selftext","")).strip())
-                if not (title_ok or body_ok):
-                    continue
+        with ProcessPoolExecutor(max_workers=workers, initializer=_seed_langdetect) as pool:
+            pending = deque() # chunks in submission order, bounded so memory stays flat
+            for chunk in _chunked(pairs, chunk_size):
+                texts = [text for _, text in chunk]
+                flags = self._cached_flags(texts)
+                misses = [t for t, f in zip(texts, flags) if f is None]
+                future = pool.submit(detect_english_batch, misses) if misses else None
+                pending.append((chunk, flags, future))
+                if len(pending) >= workers * 2:
+                    yield from self._keep_english(*pending.popleft())
+            while pending:
+                yield from self._keep_english(*pending.popleft())
 
-                if record.get("score", 0) < 5: #checks has >= 5 upvotes
-                    continue
+    def filter_records(self, records: Iterable[dict], start_ts: int, end_ts: int) -> List[dict]:
+        """
+        row_filtering for records already in memory (e.g. a scoring-service batch):
+        the same cheap checks and inline language detection, in input order.
+        """
+        DetectorFactory.seed = LANGDETECT_SEED
+        pairs = []
+        for record in records:
+            self.counts["lines_read"] += 1
+            try:
+                text = self.cheap_filtering(record, start_ts, end_ts)
+            except (TypeError, ValueError): # missing / non-numeric created_utc or score
+                self.counts["drop_bad_record"] += 1
+                continue
+            if text is not None:
+                pairs.append((record, text))
+        return list(self._english_inline(pairs))
 
-                text = " ".join([record.get("title",""), record.get("selftext","")]).strip()
-                if not text:
-                    continue
-                try:
-                    if detect(text) != "en":
-                        continue # skip non-english
-                except LangDetectException:
-                    continue # skip if detection fails
-                
+    def _english_inline(self, chunk):
+        texts = [text for _, text in chunk]
+        flags = self._cached_flags(texts)
+        for i, (record, text) in enumerate(chunk):
+            if flags[i] is None:
+                flags[i] = is_english(text)
+                self._store_flag(text, flags[i])
+            if flags[i]:
+                self.counts["kept"] += 1
                 yield record
+            else:
+                self.counts["drop_non_english"] += 1
 
-    def text_construction(self, records, out_path):
-        import json
-        with open(out_path, "w") as fout:
-            for rec in records:
-                title = rec.get("title", "")
-                selftext = rec.get("selftext", "")
-                text_clean = self.regex_filtering((" ".join([title, selftext])).strip())
-                if self.is_spam(text_clean):
-                    continue
+    def _cached_flags(self, texts: List[str]) -> list:
+        if self.cache is None:
+            return [None] * len(texts)
+        return self.cache.get_many(self.LANG_NAMESPACE, self.lang_version, texts)
 
-                rec["text_clean"] = text_clean
-                rec["text_len_words"] = len(text_clean.split())
-                rec["is_english"] = True
-                low_text = text_clean.lower()
-                syms = self.extract_tickers(title + " " + selftext)
-                rec["tickers"] = syms
-                rec["has_ticker"] = bool(syms)
-                rec["sector_keyword_present"] = any(k in low_text for k in self.sector_keys)
-                rec["in_scope"] = rec["has_ticker"] or rec["sector_keyword_present"]
+    def _store_flag(self, text: str, flag: bool) -> None:
+        if self.cache is not None:
+            self.cache.put(self.LANG_NAMESPACE, self.lang_version, text, flag)
 
-                fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    def _keep_english(self, chunk, flags, future):
+        detected = iter(future.result()) if future is not None else iter(())
+        for (record, text), flag in zip(chunk, flags):
+            if flag is None:
+                flag = next(detected)
+                self._store_flag(text, flag)
+            if flag:
+                self.counts["kept"] += 1
+                yield record
+            else:
+                self.counts["drop_non_english"] += 1
+
+    def normalize_record(self, rec: dict):
+        """
+        Scope-independent cleaning: adds text_clean, text_len_words, is_english to rec.
+        Returns the NormalizedText, or None if the record is spam.
+        """
+        title = rec.get("title", "")
+        selftext = rec.get("selftext", "")
+        norm = self.normalizer.normalize((" ".join([title, selftext])).strip())
+        if norm.is_spam:
+            self.counts["drop_spam"] += 1
+            return None
+
+        rec["text_clean"] = norm.text
+        rec["text_len_words"] = norm.n_words
+        rec["is_english"] = True
+        return norm
+
+    def tag_record(self, rec: dict, low_text: str = None) -> dict:
+        """Scope-dependent fields: tickers, has_ticker, sector_keyword_present, in_scope."""
+        if low_text is None:
+            low_text = rec["text_clean"].lower()
+        syms = self.extract_tickers(rec.get("title", "") + " " + rec.get("selftext", ""))
+        rec["tickers"] = syms
+        rec["has_ticker"] = bool(syms)
+        rec["sector_keyword_present"] = self.matcher.has_keyword(low_text)
+        rec["in_scope"] = rec["has_ticker"] or rec["sector_keyword_present"]
+        return rec
+
+    def text_construction(self, records, out_path) -> int:
+        """Clean + tag records and write them to out_path; returns the number written."""
+        n = 0
+        with self.storage.writer(out_path) as out:
+            for rec in records:
+                norm = self.normalize_record(rec)
+                if norm is None:
+                    continue
+                out.write(self.tag_record(rec, norm.lower))
+                n += 1
+        return n
 
     def regex_filtering(self, clean_text: str):
-        clean_text = re.sub(r"[\w\.-]+@[\w\.-]+\.\w+", r"<\g<0>>", clean_text) # puts <> around email addresses
-        clean_text = re.sub(r"\s{2,}", " ", clean_text) # removes repeated spaces
-        clean_text = re.sub(r"(https?://[^\s]+|www\.[^\s]+)", r"<\g<0>>", clean_text) # puts <> around URL
-        clean_text = re.sub(r"^>.*$", "", clean_text, flags=re.MULTILINE) # Remove blockquotes at the start of a line (> something)
-        clean_text = re.sub(r"```.*?```", "", clean_text, flags=re.DOTALL) # Remove code blocks wrapped in triple backticks (```...```)
-        clean_text = re.sub(r"`[^`]+`", "", clean_text) # Remove inline code wrapped in single backticks (`...`)
-        return clean_text
+        return self.normalizer.normalize(clean_text).text
 
     def is_spam(self, clean_text: str) -> bool:
-
-        spam_keywords = ["buy now", "free", "click here", "subscribe", "visit", "offer"]
-        if any(word in clean_text.lower() for word in spam_keywords):
-            return True
-        if re.search(r"(https?://[^\s]+)", clean_text):  # only link
-            if len(clean_text.split()) <= 3:
-                return True
-        if clean_text.count("!") > 5:
-            return True
-        return False
+        return self.normalizer.spam_verdict(clean_text, clean_text.lower(), len(clean_text.split()))
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
-from scipy.stats import pearsonr
 
 def evaluate(features_path: str, returns_path: str, output_path: str):
+    from scipy.stats import pearsonr # scipy.stats is slow to import; load it only when evaluating
+
     features = pd.read_csv(features_path, index_col=0, parse_dates=True)
     returns = pd.read_csv(returns_path, index_col=0, parse_dates=True)
 
@@ -34,4 +36,75 @@ def evaluate(features_path: str, returns_path: str, output_path: str):
 
     # Save output
     out_df = pd.concat(out_rows)
-    out_df.to_csv(output_path)
\ No newline at end of file
+    out_df.to_csv(output_path)
+
+def corr_matrix(X: np.ndarray, Y: np.ndarray):
+    """
+    Pearson correlation of every column of X (T x F) with every column of Y (T x M),
+    using pairwise-complete rows (NaNs ignored per pair), via masked matrix products.
+    Returns (r, p, n), each F x M; the two-sided p-value matches scipy's pearsonr.
+    """
+    from scipy.stats import t as student_t
+
+    mx, my = ~np.isnan(X), ~np.isnan(Y)
+    Mx, My = mx.astype(np.float64), my.astype(np.float64)
+    # correlation is shift-invariant; centring first keeps the sums well conditioned
+    X0 = np.where(mx, X - np.where(mx, X, 0.0).sum(axis=0) / np.maximum(1.0, Mx.sum(axis=0)), 0.0)
+    Y0 = np.where(my, Y - np.where(my, Y, 0.0).sum(axis=0) / np.maximum(1.0, My.sum(axis=0)), 0.0)
+
+    n = Mx.T @ My
+    sx, sy = X0.T @ My, Mx.T @ Y0
+    sxx, syy = (X0 * X0).T @ My, Mx.T @ (Y0 * Y0)
+    sxy = X0.T @ Y0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sy
+        var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        r = np.clip(cov / np.sqrt(var), -1.0, 1.0)
+        r[(n < 2) | (var <= 0)] = np.nan
+        df = n - 2
+        t = r * np.sqrt(df / np.maximum(1e-300, 1.0 - r * r))
+        p = 2.0 * student_t.sf(np.abs(t), df)
+    p[(n == 2) & ~np.isnan(r)] = 1.0 # two points always fit a line exactly
+    return r, p, n.astype(np.int64)
+
+def evaluate_matrix(features: pd.DataFrame, returns: pd.DataFrame, lags=(0,)) -> pd.DataFrame:
+    """
+    Correlate every feature column, at every lag, with every forward-return column
+    (e.g. the (ret_fwd_{h}d, ticker) columns from make_forward_returns) in one pass.
+    Features are aligned to the return dates first; lag L pairs a return with the
+    feature value from L rows (trading days) earlier.
+    Returns a tidy table: feature, lag, horizon, ticker, n, corr, p_value.
+    """
+    feats = features.select_dtypes("number").reindex(returns.index)
+    blocks, labels = [], []
+    for lag in lags:
+        blocks.append(feats.shift(lag).to_numpy(dtype=np.float64))
+        labels.extend((col, lag) for col in feats.columns)
+    X = np.hstack(blocks)
+    Y = returns.to_numpy(dtype=np.float64)
+    r, p, n = corr_matrix(X, Y)
+
+    ret_cols = [c if isinstance(c, tuple) else (c, "") for c in returns.columns]
+    fi, ri = np.meshgrid(np.arange(len(labels)), np.arange(len(ret_cols)), indexing="ij")
+    fi, ri = fi.ravel(), ri.ravel()
+    return pd.DataFrame({
+        "feature": [labels[i][0] for i in fi],
+        "lag": [labels[i][1] for i in fi],
+        "horizon": [ret_cols[j][0] for j in ri],
+        "ticker": [ret_cols[j][1] for j in ri],
+        "n": n.ravel(),
+        "corr": r.ravel(),
+        "p_value": p.ravel(),
+    })
+
+def evaluate_universe(features_path: str, returns_path: str, output_path: str, lags=(0,)) -> pd.DataFrame:
+    """
+    File-level wrapper: features_daily.csv x multi-ticker returns CSV
+    (two header rows: horizon, ticker) -> tidy correlation table CSV.
+    """
+    features = pd.read_csv(features_path, index_col=0, parse_dates=True)
+    returns = pd.read_csv(returns_path, index_col=0, header=[0, 1], parse_dates=True)
+    out = evaluate_matrix(features, returns, lags=lags)
+    out.to_csv(output_path, index=False)
+    return out
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from src.clean import Cleaner
+from src.features import FeatureProcessor, DailyAccumulator
+
+def build_corpus(raw_path: str, corpus_out: str, start_ts: int, end_ts: int,
+                 cleaner: Cleaner, feats: FeatureProcessor, workers: int = 1, batch_size: int = 1000) -> int:
+    """
+    Scope-independent stages, run once for all scopes: parse + row filtering,
+    language detection, text normalisation/spam removal and VADER scores.
+    The corpus has no tickers / in_scope / weight fields; those are added per scope.
+    Returns the number of records written.
+    """
+    n = 0
+    with feats.storage.writer(corpus_out) as out:
+        batch = []
+        for rec in cleaner.row_filtering(raw_path, start_ts, end_ts, workers=workers):
+            norm = cleaner.normalize_record(rec)
+            if norm is None or not norm.text.strip(): # spam, or nothing left to score (process_file skips these too)
+                continue
+            batch.append(rec)
+            n += 1
+            if len(batch) >= batch_size:
+                feats.write_scored(batch, out, weight=False) # weights depend on the scope's config
+                batch = []
+        feats.write_scored(batch, out, weight=False)
+    return n
+
+class ScopeRunner:
+    """
+    Cheap per-scope fan-out over a shared scored corpus: entity tagging,
+    weighting and daily aggregation for one scope config. Gives the same
+    scored records / features as the full pipeline run with that config.
+    """
+    def __init__(self, cfg: dict, storage=None):
+        self.cfg = cfg
+        self.cleaner = Cleaner(cfg, storage=storage)
+        self.feats = FeatureProcessor(cfg, storage=storage)
+        self.storage = self.feats.storage
+
+    def tag_frame(self, df):
+        """Same fields as Cleaner.tag_record, for a DataFrame chunk."""
+        def text_col(name):
+            return df[name].fillna("").astype(str) if name in df.columns else pd.Series("", index=df.index)
+
+        matcher = self.cleaner.matcher
+        raw = text_col("title") + " " + text_col("selftext")
+        df["tickers"] = raw.map(matcher.extract_tickers)
+        df["has_ticker"] = df["tickers"].str.len() > 0
+        df["sector_keyword_present"] = df["text_clean"].str.lower().map(matcher.has_keyword)
+        df["in_scope"] = df["has_ticker"] | df["sector_keyword_present"]
+        return df
+
+    def run(self, corpus_path: str, features_out: str, scored_out: str = None, chunk_size: int = 100_000,
+            windows=None) -> DailyAccumulator:
+        """
+        Tag + weight the corpus in chunks, optionally write this scope's scored records
+        and fill a WindowedFeatures, write daily features.
+        """
+        acc = DailyAccumulator()
+        out = self.storage.writer(scored_out) if scored_out else None
+        try:
+            for df in self.storage.read_frames(corpus_path, chunk_size=chunk_size):
+                if df.empty or "text_clean" not in df.columns:
+                    continue
+                df = self.tag_frame(df.copy())
+                df["weight"] = self.feats.compute_weights(df)
+                if out is not None:
+                    out.write_frame(df)
+                acc.update(df[df["in_scope"]])
+                if windows is not None:
+                    windows.update(df[df["in_scope"]])
+        finally:
+            if out is not None:
+                out.close()
+        acc.to_features().to_csv(features_out, index=True)
+        return acc
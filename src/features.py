@@ -1,27 +1,59 @@
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from typing import Dict
-import json
+from typing import Dict, List
 import math
+import numpy as np
+from src.sentiment import SCORE_KEYS, get_backend
+from src.storage import JsonlStorage
 
 class FeatureProcessor:
-    def __init__(self, cfg: dict):
+    AGG_COLUMNS = ["created_utc", "compound", "weight", "in_scope"] # all aggregate_daily needs to read
+
+    def __init__(self, cfg: dict, cache=None, storage=None):
         self.cfg = cfg
-        self.analyser = SentimentIntensityAnalyzer()
+        self.storage = storage if storage is not None else JsonlStorage() # work-directory file format
+        self.scorer = get_backend(cfg.get("sentiment_backend", "vader")) # "vader" or "lexicon"
+        self.cache = cache # optional ResultCache, reuses scores from earlier runs (kept per backend)
         self.decay_values = cfg.get("decay", {})
         self.subreddit_weights = cfg.get("subreddit_weights", {})
         self.lmbda = float(self.decay_values.get("lambda", 0.0))
         self.cap = float(self.decay_values.get("cap", 10.0))
 
     def get_scores(self, record: Dict) -> Dict[str, float]:
-        return self.analyser.polarity_scores(record["text_clean"])
+        return self.get_scores_many([record["text_clean"]])[0]
+
+    def get_scores_many(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Score a batch of texts; one neg/neu/pos/compound dict per text."""
+        arrays = self.score_arrays(texts)
+        columns = [arrays[k].tolist() for k in SCORE_KEYS]
+        return [dict(zip(SCORE_KEYS, row)) for row in zip(*columns)]
+
+    def score_arrays(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Score a batch of texts with the configured backend; neg/neu/pos/compound arrays.
+        Repeats are served from the cache when one is attached, only misses are scored.
+        """
+        if self.cache is None:
+            return self.scorer.score_batch(texts)
+        cached = self.cache.get_many(self.scorer.name, self.scorer.version, texts)
+        out = {k: np.array([0.0 if c is None else c[k] for c in cached]) for k in SCORE_KEYS}
+        misses = [i for i, c in enumerate(cached) if c is None]
+        if misses:
+            fresh = self.scorer.score_batch([texts[i] for i in misses])
+            for k in SCORE_KEYS:
+                out[k][misses] = fresh[k]
+            for j, i in enumerate(misses):
+                self.cache.put(self.scorer.name, self.scorer.version, texts[i], {k: float(fresh[k][j]) for k in SCORE_KEYS})
+        return out
 
-    def attach_scores(self, record: Dict) -> Dict:
-        scores = self.get_scores(record)
+    def attach_scores(self, record: Dict, scores: Dict[str, float] = None, weight: bool = True) -> Dict:
+        """Sentiment scores and source_type; weight=False leaves the weight to a later stage (e.g. the fan-out corpus)."""
+        if scores is None:
+            scores = self.get_scores(record)
         record.update(scores)
         # Attach source type for downstream aggregation
         record["source_type"] = "comment" if record.get("is_comment") else "post"
         # Precompute a simple engagement weight
-        record["weight"] = self.compute_weight(record)
+        if weight:
+            record["weight"] = self.compute_weight(record)
         return record
 
     def compute_weight(self, record: Dict) -> float:
@@ -58,61 +90,210 @@ class FeatureProcessor:
             post_weight = min(self.cap, base * entity_boost * decay * sub_w * quality * short_penalty)
             return post_weight
 
-    def process_file(self, in_path: str, out_path: str) -> None:
+    @staticmethod
+    def _column(df, name: str, default) -> np.ndarray:
+        """Numeric column as float64, with missing column / nulls replaced by default."""
+        if name not in df.columns:
+            return np.full(len(df), float(default))
+        import pandas as pd
+        return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _flag(df, name: str) -> np.ndarray:
+        if name not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        return df[name].fillna(False).astype(bool).to_numpy()
+
+    def compute_weights(self, df) -> np.ndarray:
         """
-        Read a JSONL file of cleaned records - must contain 'text_clean'
-        Attach VADER sentiment scores to each, and write JSONL to out_path
+        Vectorised compute_weight over a DataFrame of cleaned records.
+        Same formula, evaluated column-wise; int() casts become np.trunc.
         """
-        with open(in_path, "r") as fin, open(out_path, "w") as fout:
-            for line in fin:
-                if not line.strip():
+        age_hours = np.maximum(0.0, (self._column(df, "ingested_at_utc", 0) - self._column(df, "created_utc", 0)) / 3600.0)
+        decay = np.exp(-self.lmbda * age_hours)
+        is_comment = self._flag(df, "is_comment")
+        if "tickers" in df.columns:
+            n_tickers = df["tickers"].str.len().fillna(0).to_numpy(dtype=np.float64)
+        else:
+            n_tickers = np.zeros(len(df))
+        entity_boost = 1.0 + 0.2 * n_tickers + np.where(self._flag(df, "sector_keyword_present"), 0.2, 0.0)
+
+        # Comments: comment_score, rank (missing/0 -> 1), scaled down by the post's comment count
+        cs = np.maximum(0.0, np.trunc(self._column(df, "comment_score", 0)))
+        rank = np.trunc(self._column(df, "rank", 0))
+        rank_factor = 1.0 / np.maximum(1.0, np.where(rank == 0, 1.0, rank))
+        total_comments = np.trunc(self._column(df, "num_comments", 0))
+        scale = 1.0 / (1.0 + np.maximum(0.0, total_comments))
+        comment_weight = (1.0 + np.log1p(cs)) * rank_factor * decay * entity_boost * scale
+
+        # Posts: score & num_comments, subreddit weight, spam / short-text penalties
+        sc = np.maximum(0.0, np.trunc(self._column(df, "score", 0)))
+        nc = np.maximum(0.0, total_comments)
+        base = 1.0 + np.log1p(sc) + 0.5 * np.log1p(nc)
+        if "subreddit" in df.columns:
+            sub_w = df["subreddit"].map(self.subreddit_weights).astype(np.float64).fillna(1.0).to_numpy()  # default 1.0 if missing
+        else:
+            sub_w = np.ones(len(df))
+        quality = np.where(self._flag(df, "is_spam"), 0.2, 1.0)
+        short_penalty = np.where(np.trunc(self._column(df, "text_len_words", 0)) < 5, 0.5, 1.0)
+        post_weight = base * entity_boost * decay * sub_w * quality * short_penalty
+
+        return np.minimum(self.cap, np.where(is_comment, comment_weight, post_weight))
+
+    def score_frame(self, df):
+        """Attach neg/neu/pos/compound, source_type and weight columns to a chunk of cleaned records."""
+        scores = self.score_arrays(df["text_clean"].tolist())
+        for col in SCORE_KEYS:
+            df[col] = scores[col]
+        df["source_type"] = np.where(self._flag(df, "is_comment"), "comment", "post")
+        df["weight"] = self.compute_weights(df)
+        return df
+
+    def process_file_columnar(self, in_path: str, out_path: str, chunk_size: int = 100_000) -> int:
+        """
+        Columnar process_file: reads cleaned records in chunks into DataFrames,
+        scores and weights each chunk column-wise, and appends it to out_path.
+        Returns the number of records written.
+        """
+        n = 0
+        with self.storage.writer(out_path) as out:
+            for df in self.storage.read_frames(in_path, chunk_size=chunk_size):
+                if "text_clean" not in df.columns:
                     continue
-                try:
-                    rec = json.loads(line)
-                except json.JSONDecodeError:
+                # skip if no text_clean
+                ok = df["text_clean"].map(lambda t: isinstance(t, str) and bool(t.strip()))
+                df = df[ok]
+                if df.empty:
                     continue
+                out.write_frame(self.score_frame(df.copy()))
+                n += len(df)
+        return n
+
+    def process_file(self, in_path: str, out_path: str, batch_size: int = 1000) -> int:
+        """
+        Read a file of cleaned records - must contain 'text_clean'
+        Attach VADER sentiment scores to each, and write them to out_path
+        Returns the number of records written.
+        """
+        n = 0
+        with self.storage.writer(out_path) as out:
+            batch = []
+            for rec in self.storage.read_records(in_path):
                 # skip if no text_clean
                 if "text_clean" not in rec or not isinstance(rec["text_clean"], str) or not rec["text_clean"].strip():
                     continue
-                rec = self.attach_scores(rec)
-                fout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                batch.append(rec)
+                if len(batch) >= batch_size:
+                    n += self.write_scored(batch, out)
+                    batch = []
+            n += self.write_scored(batch, out)
+        return n
+
+    def write_scored(self, batch: List[Dict], out, weight: bool = True) -> int:
+        """Score a batch of cleaned records in one call, attach the scores and write them to out."""
+        scores = self.get_scores_many([rec["text_clean"] for rec in batch])
+        for rec, sc in zip(batch, scores):
+            out.write(self.attach_scores(rec, sc, weight=weight))
+        return len(batch)
 
-    def aggregate_daily(self, scored_path: str, features_out: str) -> None:
+    def accumulate_daily(self, scored_path: str, acc: "DailyAccumulator" = None, chunk_size: int = 100_000,
+                         allow_empty: bool = False, windows=None) -> "DailyAccumulator":
         """
-        Read scored JSONL, filter, group by calendar date (UTC),
-        compute weighted & plain mean sentiment for posts and 
-        comments that day.
+        Stream scored records in fixed-size chunks into per-day running sums,
+        reading only the columns aggregation needs.
+        Pass an existing accumulator to add another shard to it, and a
+        WindowedFeatures to update its hourly state from the same chunks.
         """
+        acc = acc if acc is not None else DailyAccumulator()
+        needed = {"compound", "weight", "created_utc"}
+        seen = False
+        for df in self.storage.read_frames(scored_path, columns=self.AGG_COLUMNS, chunk_size=chunk_size):
+            seen = True
+            if "in_scope" in df.columns:
+                df = df[df["in_scope"] == True]
+            missing = needed - set(df.columns)
+            if missing:
+                raise ValueError(f"Missing columns in scored data: {missing}")
+            acc.update(df)
+            if windows is not None:
+                windows.update(df)
+        if not seen and not allow_empty:
+            raise ValueError(f"Missing columns in scored data: {needed}")
+        return acc
+
+    def aggregate_daily(self, scored_path, features_out: str, chunk_size: int = 100_000, windows=None):
+        """
+        Read scored records (one path or a list of shards) in chunks, filter,
+        group by calendar date (UTC), compute weighted & plain mean sentiment
+        for posts and comments that day. Optionally fills a WindowedFeatures
+        in the same pass.
+        """
+        paths = [scored_path] if isinstance(scored_path, str) else list(scored_path)
+        acc = DailyAccumulator()
+        for path in paths:
+            self.accumulate_daily(path, acc, chunk_size=chunk_size, windows=windows)
+        out = acc.to_features()
+        out.to_csv(features_out, index=True)
+        return out
+
+class DailyAccumulator:
+    """
+    Mergeable per-day running sums: sum(w*compound), sum(w), sum(compound),
+    number of scored items and number of rows. Memory grows with the number
+    of days, not the number of records.
+    """
+    COLUMNS = ["sum_wc", "sum_w", "sum_c", "n_c", "n"]
+
+    def __init__(self, sums=None):
         import pandas as pd
+        self.sums = sums if sums is not None else pd.DataFrame(columns=self.COLUMNS, dtype="float64")
 
-        df = pd.read_json(scored_path, lines=True)
-        if "in_scope" in df.columns:
-            df = df[df["in_scope"] == True]
+    def update(self, df) -> None:
+        """Add a chunk with created_utc, compound and weight columns."""
+        import pandas as pd
 
-        needed = {"compound", "weight", "created_utc"}
-        missing = needed - set(df.columns)
-        if missing:
-            raise ValueError(f"Missing columns in scored data: {missing}")
+        if df.empty:
+            return
+        compound = pd.to_numeric(df["compound"], errors="coerce")
+        weight = pd.to_numeric(df["weight"], errors="coerce")
+        dt_utc = pd.to_datetime(pd.to_numeric(df["created_utc"]), unit="s", utc=True)
+        date = dt_utc.dt.normalize().dt.tz_localize(None).rename("date")  # 00:00:00, tz-naive
+        part = pd.DataFrame({
+            "sum_wc": compound * weight,
+            "sum_w": weight,
+            "sum_c": compound,
+            "n_c": compound.notna().astype("float64"),
+            "n": 1.0,
+        }).groupby(date).sum()
+        self.sums = part if self.sums.empty else self.sums.add(part, fill_value=0.0)
 
-        dt_utc = pd.to_datetime(df["created_utc"], unit="s", utc=True)
-        df["date"] = dt_utc.dt.normalize().dt.tz_localize(None)  # 00:00:00, tz-naive
-        
-        grp = df.groupby("date", as_index=True) # creates groups of dates, and applies following lambda function to each group
-        sent_mean_weighted = grp.apply(lambda x: 0.0 if x["weight"].sum() == 0 
-                                       else (x["compound"] * x["weight"]).sum() / x["weight"].sum(),
-                                       include_groups=False
-                                       )
-        sent_mean = grp["compound"].mean()
-        n_items = grp.size()
-
-        out = (
-            pd.DataFrame(
-                {
-                    "sent_mean_weighted": sent_mean_weighted,
-                    "sent_mean": sent_mean,
-                    "n_items": n_items,
-                }
-            ).sort_index()
+    def merge(self, other: "DailyAccumulator") -> "DailyAccumulator":
+        """Combine partial aggregates (e.g. from separate shards) in place."""
+        if not other.sums.empty:
+            self.sums = other.sums.copy() if self.sums.empty else self.sums.add(other.sums, fill_value=0.0)
+        return self
+
+    def to_features(self):
+        """Daily features in the features_daily.csv layout."""
+        import pandas as pd
+
+        s = self.sums.sort_index()
+        w = s["sum_w"]
+        out = pd.DataFrame(
+            {
+                "sent_mean_weighted": (s["sum_wc"] / w).where(w != 0, 0.0),
+                "sent_mean": s["sum_c"] / s["n_c"].where(s["n_c"] != 0),
+                "n_items": s["n"].astype("int64"),
+            }
         )
         out.index.name = "date"
-        out.to_csv(features_out, index=True)
\ No newline at end of file
+        return out
+
+    def save(self, path: str) -> None:
+        """Persist the running sums so a later run can merge without re-reading records."""
+        self.sums.sort_index().to_csv(path, index=True, index_label="date")
+
+    @classmethod
+    def load(cls, path: str) -> "DailyAccumulator":
+        import pandas as pd
+        return cls(pd.read_csv(path, index_col="date", parse_dates=True, float_precision="round_trip")) # bit-exact reload
@@ -1,39 +1,152 @@
 import yaml
-import praw
+import hashlib
 import json, os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
+from src.storage import JsonlStorage
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second and holds at
+    most `burst` tokens. acquire() blocks until a token is available.
+    """
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(self.burst)
+        self.last = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            self.sleep(wait)
+
+def retryable_errors() -> tuple:
+    """Transient errors worth retrying; 4xx responses (NotFound, Forbidden, ...) are not."""
+    import prawcore # PRAW's HTTP layer, imported on first use so commands that never call Reddit start fast
+
+    return (
+        prawcore.exceptions.ServerError,
+        prawcore.exceptions.TooManyRequests,
+        prawcore.exceptions.RequestException,
+        ConnectionError,
+        TimeoutError,
+    )
 
 class IngestService:
-    def __init__(self, reddit_client, config, repository):
-        self.reddit = reddit_client         # PRAW client
+    def __init__(self, reddit_client, config, repository, limiter=None, sleep=time.sleep):
+        self.reddit = reddit_client         # PRAW client (or anything with subreddit().search() / submission())
         self.config = config                # YAML scope (subreddits, keywords, etc.)
         self.repo = repository              # handles file writing
         self.posts_df = None
         self.comments_df = None
         self.meta = {}
+        self.concurrency = max(1, int(config.get("ingest_concurrency", 1)))   # parallel API calls
+        self.max_retries = int(config.get("max_retries", 3))
+        self.backoff = float(config.get("retry_backoff_s", 1.0))              # 1s, 2s, 4s, ...
+        # Reddit's OAuth quota is 100 requests/minute per client
+        rpm = float(config.get("requests_per_minute", 100))
+        self.limiter = limiter if limiter is not None else RateLimiter(rpm / 60.0, burst=self.concurrency)
+        self.sleep = sleep
+        self.retryable = retryable_errors()
 
-    def fetch_posts(self):
-        rows = []
+    def _call(self, fn, *args):
+        """Run one API call under the rate limiter, retrying transient errors with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                return fn(*args)
+            except self.retryable:
+                if attempt == self.max_retries:
+                    raise
+                self.sleep(self.backoff * (2 ** attempt) * (1.0 + random.random() * 0.1)) # jitter avoids retry bursts
+
+    def _imap(self, fn, items):
+        """
+        Lazily yield fn(*item) in input order with up to `concurrency` calls in flight,
+        so results can be written out as they arrive.
+        """
+        if self.concurrency <= 1:
+            for item in items:
+                yield self._call(fn, *item)
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = deque()
+            for item in items:
+                pending.append(pool.submit(self._call, fn, *item))
+                if len(pending) >= self.concurrency * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _map(self, fn, items):
+        return list(self._imap(fn, items))
+
+    def _search(self, sub, keyword):
         num_posts = self.config.get("max_posts_per_query", 10)
-        for sub in self.config['subreddits']:
-            for keyword in self.config['keywords']:
-                submissions = self.reddit.subreddit(sub).search(keyword, limit=num_posts, sort="new", time_filter=self.config['time_filter'])
-                for s in submissions:
-                    rows.append({
-                        "post_id": s.id,
-                        "subreddit": sub,
-                        "created_utc": int(s.created_utc),
-                        "title": s.title,
-                        "selftext": s.selftext,
-                        "score": s.score,
-                        "num_comments": s.num_comments,
-                        "url": s.url,
-                        "keyword_matched": keyword,
-                        "scope_name": self.config['name'],
-                        "ingested_at_utc": int(datetime.now(timezone.utc).timestamp()),
-                        "is_comment": False
-                    })
+        submissions = self.reddit.subreddit(sub).search(keyword, limit=num_posts, sort="new", time_filter=self.config['time_filter'])
+        rows = []
+        for s in submissions: # the listing is fetched lazily, so iterate inside the retried call
+            rows.append({
+                "post_id": s.id,
+                "subreddit": sub,
+                "created_utc": int(s.created_utc),
+                "title": s.title,
+                "selftext": s.selftext,
+                "score": s.score,
+                "num_comments": s.num_comments,
+                "url": s.url,
+                "keyword_matched": keyword,
+                "scope_name": self.config['name'],
+                "ingested_at_utc": int(datetime.now(timezone.utc).timestamp()),
+                "is_comment": False
+            })
+        return rows
+
+    def _top_comments(self, post_id):
+        submission = self.reddit.submission(id=post_id)
+        submission.comments.replace_more(limit=0)
+        rows = []
+        for rank, c in enumerate(submission.comments[:self.config['top_comments']], start=1):  # top n, specified in yaml
+            rows.append({
+                "post_id": post_id,
+                "comment_id": c.id,
+                "created_utc": int(c.created_utc),
+                "comment_text": c.body,
+                "comment_score": c.score,
+                "rank": rank,
+                "scope_name": self.config['name'],
+                "ingested_at_utc": int(datetime.now(timezone.utc).timestamp()),
+                "is_comment" : True
+            })
+        return rows
+
+    def fetch_posts(self):
+        queries = [(sub, keyword) for sub in self.config['subreddits'] for keyword in self.config['keywords']]
+        rows, seen = [], set()
+        for result in self._map(self._search, queries):
+            for row in result:
+                # the same post often matches several keywords; keep the first (sub, keyword) hit
+                if row["post_id"] in seen:
+                    continue
+                seen.add(row["post_id"])
+                rows.append(row)
         self.posts_df = pd.DataFrame(rows)
 
 
@@ -46,27 +159,45 @@ class IngestService:
             self.comments_df = pd.DataFrame()
             return
 
-        rows = []
-        for post_id in self.posts_df['post_id']:
-            submission = self.reddit.submission(id=post_id)
-            submission.comments.replace_more(limit=0)
-            for rank, c in enumerate(submission.comments[:self.config['top_comments']], start=1):  # top n, specified in yaml
-                rows.append({
-                    "post_id": post_id,
-                    "comment_id": c.id,
-                    "created_utc": int(c.created_utc),
-                    "comment_text": c.body,
-                    "comment_score": c.score,
-                    "rank": rank,
-                    "scope_name": self.config['name'],
-                    "ingested_at_utc": int(datetime.now(timezone.utc).timestamp()),
-                    "is_comment" : True
-                })
-        self.comments_df = pd.DataFrame(rows)
+        results = self._map(self._top_comments, [(post_id,) for post_id in self.posts_df['post_id']])
+        self.comments_df = pd.DataFrame([row for result in results for row in result])
+
+    def ingest_streaming(self, today=None, batch_size=500):
+        """
+        Fetch posts then comments, appending rows to disk in batches as they arrive
+        instead of holding them in posts_df/comments_df. Completed queries and
+        comment fetches are checkpointed, so re-running after a crash resumes where
+        it stopped; post_ids already stored by earlier runs are skipped.
+        """
+        today = today or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        stream = self.repo.open_stream(self.config, today, batch_size=batch_size)
+        try:
+            queries = [(sub, keyword) for sub in self.config['subreddits'] for keyword in self.config['keywords']]
+            todo = [q for q in queries if not stream.query_done(q)]
+            for query, rows in zip(todo, self._imap(self._search, todo)):
+                stream.add_posts(query, rows)
+
+            if self.config.get("search_top_comments", False):
+                todo = [(post_id,) for post_id in stream.posts_without_comments()]
+                for (post_id,), rows in zip(todo, self._imap(self._top_comments, todo)):
+                    stream.add_comments(post_id, rows)
+        finally:
+            stream.close()
+
+        self.meta = {
+        "scope": self.config.get("name"),
+        "time_filter": self.config.get("time_filter"),
+        "subreddits": self.config.get("subreddits", []),
+        "keywords": self.config.get("keywords", []),
+        "posts_count": stream.posts_count,
+        "comments_count": stream.comments_count,
+        "ingested_at_utc": int(datetime.now(timezone.utc).timestamp())
+        }
+        self.repo.write_meta(self.meta, self.config, today)
 
     def write_raw(self):
         """Hand off to repository to persist data."""
-        today = datetime.date.today().strftime("%Y-%m-%d")
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
         self.meta = {
         "scope": self.config.get("name"),
@@ -81,19 +212,176 @@ class IngestService:
         self.repo.write_comments(self.comments_df, self.config, today)
         self.repo.write_meta(self.meta, self.config, today)
 
+class IngestStream:
+    """
+    Append-mode writer for one day's ingest. Rows are buffered and flushed every
+    batch_size rows; each flush writes rows, then the new post_ids to the seen-ID
+    index, then the checkpoint, so the checkpoint never claims unwritten work.
+    A crash after the rows but before the checkpoint leaves rows the checkpoint
+    doesn't know about; on open they are read back from the day's files and
+    treated as stored, so the resumed run doesn't append them a second time.
+    """
+    def __init__(self, repo, config, today, batch_size=500):
+        self.repo = repo
+        self.config = config
+        self.today = today
+        self.batch_size = batch_size
+        self.seen = repo.load_seen_ids(config)
+        ckpt = repo.load_checkpoint(config, today)
+        self.queries_done = {tuple(q) for q in ckpt.get("queries_done", [])}
+        self.post_ids = list(ckpt.get("post_ids", []))     # posts stored by this day's run, in order
+        self.comments_done = set(ckpt.get("comments_done", []))
+        self.posts_count = int(ckpt.get("posts_count", 0))
+        self.comments_count = int(ckpt.get("comments_count", 0))
+        self.comment_ids = set()                           # comments already in today's file
+        self.pending_posts, self.pending_comments, self.pending_ids = [], [], []
+        self.pending_queries, self.pending_comment_posts = [], []
+        self._reconcile()
+        self.posts_out = repo.storage.writer(repo.path(config, f"posts_{today}"), append=True)
+        self.comments_out = repo.storage.writer(repo.path(config, f"comments_{today}"), append=True)
+
+    def _reconcile(self):
+        """Take rows already in today's files as stored, including any written after the last checkpoint."""
+        posts_path = self.repo.path(self.config, f"posts_{self.today}")
+        comments_path = self.repo.path(self.config, f"comments_{self.today}")
+        known = set(self.post_ids)
+        if os.path.exists(posts_path):
+            self.posts_count = 0
+            for row in self.repo.storage.read_records(posts_path):
+                self.posts_count += 1
+                key = self.repo.id_key(row["post_id"])
+                if key not in self.seen: # written, but the seen-ID index was not updated
+                    self.seen.add(key)
+                    self.pending_ids.append(key)
+                if row["post_id"] not in known:
+                    known.add(row["post_id"])
+                    self.post_ids.append(row["post_id"])
+        if os.path.exists(comments_path):
+            self.comments_count = 0
+            for row in self.repo.storage.read_records(comments_path):
+                self.comments_count += 1
+                self.comment_ids.add(row["comment_id"])
+
+    def query_done(self, query) -> bool:
+        return tuple(query) in self.queries_done
+
+    def posts_without_comments(self):
+        return [pid for pid in self.post_ids if pid not in self.comments_done]
+
+    def add_posts(self, query, rows):
+        for row in rows:
+            key = self.repo.id_key(row["post_id"])
+            if key in self.seen:
+                continue # stored by an earlier run, or matched by an earlier keyword
+            self.seen.add(key)
+            self.pending_ids.append(key)
+            self.pending_posts.append(row)
+            self.post_ids.append(row["post_id"])
+        self.pending_queries.append(tuple(query))
+        self._maybe_flush()
+
+    def add_comments(self, post_id, rows):
+        for row in rows:
+            if row["comment_id"] in self.comment_ids:
+                continue # written before a crash that preceded the checkpoint
+            self.comment_ids.add(row["comment_id"])
+            self.pending_comments.append(row)
+        self.pending_comment_posts.append(post_id)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self.pending_posts) + len(self.pending_comments) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for rec in self.pending_posts:
+            self.posts_out.write(rec)
+        for rec in self.pending_comments:
+            self.comments_out.write(rec)
+        self.posts_out.flush()
+        self.comments_out.flush()
+        # each buffer is cleared once it is on disk, so close() after a failed flush doesn't write rows twice
+        self.posts_count += len(self.pending_posts)
+        self.comments_count += len(self.pending_comments)
+        self.pending_posts, self.pending_comments = [], []
+        self.repo.append_seen_ids(self.config, self.pending_ids)
+        self.pending_ids = []
+        self.queries_done.update(self.pending_queries)
+        self.comments_done.update(self.pending_comment_posts)
+        self.repo.save_checkpoint(self.config, self.today, {
+            "queries_done": sorted(list(q) for q in self.queries_done),
+            "post_ids": self.post_ids,
+            "comments_done": sorted(self.comments_done),
+            "posts_count": self.posts_count,
+            "comments_count": self.comments_count,
+        })
+        self.pending_queries, self.pending_comment_posts = [], []
+
+    def close(self):
+        self.flush()
+        self.posts_out.close()
+        self.comments_out.close()
+
 class Repository:
-    def __init__(self, base_dir="../data/raw"):
+    def __init__(self, base_dir="../data/raw", storage=None):
         self.base_dir = base_dir
+        self.storage = storage if storage is not None else JsonlStorage(ensure_ascii=True) # raw file format
+
+    def scope_dir(self, config):
+        outdir = os.path.join(self.base_dir, config['name'])
+        os.makedirs(outdir, exist_ok=True)
+        return outdir
+
+    def path(self, config, stem):
+        return self.storage.path(os.path.join(self.scope_dir(config), stem))
+
+    def open_stream(self, config, today, batch_size=500):
+        return IngestStream(self, config, today, batch_size=batch_size)
+
+    @staticmethod
+    def id_key(post_id):
+        """Reddit ids are base36; store them as uint64 (8 bytes each) in the seen-ID index."""
+        try:
+            return int(post_id, 36) & 0xFFFFFFFFFFFFFFFF
+        except ValueError:
+            return int.from_bytes(hashlib.blake2b(str(post_id).encode("utf-8"), digest_size=8).digest(), "little")
+
+    def load_seen_ids(self, config):
+        path = os.path.join(self.scope_dir(config), "seen_post_ids.u64")
+        if not os.path.exists(path):
+            return set()
+        return set(np.fromfile(path, dtype="<u8").tolist())
+
+    def append_seen_ids(self, config, keys):
+        if not keys:
+            return
+        with open(os.path.join(self.scope_dir(config), "seen_post_ids.u64"), "ab") as f:
+            np.asarray(keys, dtype="<u8").tofile(f)
+
+    def load_checkpoint(self, config, today):
+        path = os.path.join(self.scope_dir(config), f"checkpoint_{today}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self, config, today, state):
+        path = os.path.join(self.scope_dir(config), f"checkpoint_{today}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path) # atomic
 
     def write_posts(self, posts_df, config, today):
         outdir = os.path.join(self.base_dir, config['name'])
         os.makedirs(outdir, exist_ok=True)
-        posts_df.to_json(f"{outdir}/posts_{today}.jsonl", orient="records", lines=True)
+        with self.storage.writer(self.storage.path(f"{outdir}/posts_{today}")) as out:
+            out.write_frame(posts_df)
 
     def write_comments(self, comments_df, config, today):
         outdir = os.path.join(self.base_dir, config['name'])
         os.makedirs(outdir, exist_ok=True)
-        comments_df.to_json(f"{outdir}/comments_{today}.jsonl", orient="records", lines=True)
+        with self.storage.writer(self.storage.path(f"{outdir}/comments_{today}")) as out:
+            out.write_frame(comments_df)
 
     def write_meta(self, meta, config, today):
         outdir = os.path.join(self.base_dir, config['name'])
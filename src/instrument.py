@@ -0,0 +1,161 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb() -> Optional[float]:
+    """Process-wide peak resident set size so far (high-water mark), in MB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024 # bytes on macOS, KB on Linux
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process and of finished child processes (e.g. langdetect workers)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb = None
+        self.records_in = None
+        self.records_out = None
+        self.extra = {}
+        self.child_wall = 0.0 # time spent in nested timed iterators, excluded from this stage
+        self.child_cpu = 0.0
+
+    def to_dict(self) -> Dict:
+        d = {
+            "stage": self.name,
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            "records_in": self.records_in,
+            "records_out": self.records_out,
+            "records_per_s": None,
+        }
+        n = self.records_in if self.records_in is not None else self.records_out
+        if n is not None and self.wall_s > 0:
+            d["records_per_s"] = round(n / self.wall_s, 1)
+        d.update(self.extra)
+        return d
+
+class RunReport:
+    """
+    Per-stage wall/CPU time, peak RSS and record throughput for one pipeline run,
+    written as JSON. Stages named in profile_stages are also run under cProfile
+    and their stats dumped next to the report.
+    """
+    def __init__(self, out_dir: str, profile_stages: Iterable[str] = ()):
+        self.out_dir = out_dir
+        self.profile_stages = set(profile_stages)
+        self.stages: List[StageStats] = []
+        self.active: List[StageStats] = []
+        self.profilers: Dict[str, cProfile.Profile] = {}
+        self.started = time.time()
+
+    def _profiler(self, name: str):
+        # "scope:scope_energy" is profiled by either its full name or "scope"
+        if name not in self.profile_stages and name.split(":")[0] not in self.profile_stages:
+            return None
+        return self.profilers.setdefault(name, cProfile.Profile())
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block; set .records_in / .records_out / .extra on the yielded StageStats."""
+        st = StageStats(name)
+        self.stages.append(st)
+        self.active.append(st)
+        prof = self._profiler(name)
+        wall0, cpu0 = time.perf_counter(), cpu_seconds()
+        if prof is not None:
+            prof.enable()
+        try:
+            yield st
+        finally:
+            if prof is not None:
+                prof.disable()
+            st.wall_s = time.perf_counter() - wall0 - st.child_wall
+            st.cpu_s = cpu_seconds() - cpu0 - st.child_cpu
+            st.peak_rss_mb = peak_rss_mb()
+            self.active.pop()
+
+    def timed(self, name: str, iterable: Iterable):
+        """
+        Wrap a lazy iterator (e.g. row_filtering) as its own stage: only time spent
+        producing items is counted, and that time is taken out of the enclosing stage.
+        Returns (StageStats, wrapped iterator).
+        """
+        st = StageStats(name)
+        st.records_out = 0
+        self.stages.append(st)
+        parent = self.active[-1] if self.active else None
+        return st, self._timed_iter(st, parent, self._profiler(name), iter(iterable))
+
+    @staticmethod
+    def _timed_iter(st: StageStats, parent: Optional[StageStats], prof, it):
+        while True:
+            wall0, cpu0 = time.perf_counter(), cpu_seconds()
+            if prof is not None:
+                prof.enable()
+            try:
+                item = next(it)
+            except StopIteration:
+                item = StopIteration
+            finally:
+                if prof is not None:
+                    prof.disable()
+                dw, dc = time.perf_counter() - wall0, cpu_seconds() - cpu0
+                st.wall_s += dw
+                st.cpu_s += dc
+                if parent is not None:
+                    parent.child_wall += dw
+                    parent.child_cpu += dc
+            st.peak_rss_mb = peak_rss_mb()
+            if item is StopIteration:
+                return
+            st.records_out += 1
+            yield item
+
+    def write(self, path: str = None) -> str:
+        path = path or os.path.join(self.out_dir, "run_report.json")
+        report = {
+            "started_at_utc": int(self.started),
+            "total_wall_s": round(time.time() - self.started, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": [st.to_dict() for st in self.stages],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        for name, prof in self.profilers.items():
+            prof.dump_stats(os.path.join(self.out_dir, f"profile_{name.replace(':', '_')}.prof"))
+            buf = io.StringIO()
+            pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(15)
+            print(f"\n=== cProfile: {name} ===")
+            print(buf.getvalue())
+        return path
+
+    def summary(self) -> str:
+        w = max([len("stage")] + [len(st.name) for st in self.stages]) + 2
+        lines = [f"{'stage':<{w}}{'wall_s':>10}{'cpu_s':>10}{'rss_mb':>10}{'in':>10}{'out':>10}{'rec/s':>12}"]
+        for st in self.stages:
+            d = st.to_dict()
+            fmt = lambda v, spec: "-" if v is None else format(v, spec)
+            lines.append(f"{d['stage']:<{w}}{fmt(d['wall_s'], '.3f'):>10}{fmt(d['cpu_s'], '.3f'):>10}"
+                         f"{fmt(d['peak_rss_mb'], '.0f'):>10}{fmt(d['records_in'], 'd'):>10}"
+                         f"{fmt(d['records_out'], 'd'):>10}{fmt(d['records_per_s'], '.0f'):>12}")
+        return "\n".join(lines)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def config_fingerprint(cfg: dict, *extra) -> str:
+    """Hash of the parsed scope config (comments/formatting ignored) plus any extra settings."""
+    payload = json.dumps([cfg, list(extra)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def partition_name(path: str) -> str:
+    """Stable per-input partition id, e.g. posts_2025-09-22-1a2b3c4d."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]}"
+
+class Manifest:
+    """
+    Record of which raw input files have been processed, stored as JSON in the workdir.
+    Each input maps to {size, mtime, sha256, partition}; a config fingerprint
+    invalidates everything when the scope config changes.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.fingerprint = None
+        self.inputs: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.fingerprint = data.get("config_fingerprint")
+            self.inputs = data.get("inputs", {})
+
+    def reset(self, fingerprint: str) -> None:
+        self.fingerprint = fingerprint
+        self.inputs = {}
+
+    def is_current(self, path: str) -> bool:
+        """
+        True if path was processed and is unchanged. Size + mtime is checked first;
+        the content hash is only computed when those differ (e.g. a touched file).
+        """
+        entry = self.inputs.get(os.path.abspath(path))
+        if entry is None:
+            return False
+        st = os.stat(path)
+        if st.st_size == entry["size"] and st.st_mtime == entry["mtime"]:
+            return True
+        if st.st_size != entry["size"] or file_sha256(path) != entry["sha256"]:
+            return False
+        entry["mtime"] = st.st_mtime # same content, refresh so the next run skips hashing
+        return True
+
+    def record(self, path: str, partition: str) -> None:
+        st = os.stat(path)
+        self.inputs[os.path.abspath(path)] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": file_sha256(path),
+            "partition": partition,
+        }
+
+    def partition(self, path: str) -> Optional[str]:
+        entry = self.inputs.get(os.path.abspath(path))
+        return None if entry is None else entry["partition"]
+
+    def partitions(self):
+        return sorted(e["partition"] for e in self.inputs.values())
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"config_fingerprint": self.fingerprint, "inputs": self.inputs}, f, indent=2)
+        os.replace(tmp, self.path) # atomic, a crash never leaves a half-written manifest
@@ -1,11 +1,44 @@
-import yfinance as yf
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple
+
 import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+                                    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday)
+
+class ExchangeHolidays(AbstractHolidayCalendar):
+    """Regular NYSE full-day closures (one-off closures, e.g. days of mourning, are not listed)."""
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr, USPresidentsDay, GoodFriday, USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay, USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+def trading_days(start: str, end: str) -> pd.DatetimeIndex:
+    """Weekdays in [start, end) that are not exchange holidays."""
+    days = pd.bdate_range(start, end)
+    days = days[days < pd.Timestamp(end)]
+    return days.difference(ExchangeHolidays().holidays(start, end))
 
-def fetch_prices(ticker: str, start: str, end: str) -> pd.DataFrame:
+def fetch_prices(ticker: str, start: str, end: str, store=None) -> pd.DataFrame:
     """
     Download daily prices with yfinance and return a DataFrame
     with 'adj_close' as the main column.
+    With a PriceStore, dates already stored locally are not downloaded again.
     """
+    if store is not None:
+        wide = store.get_prices([ticker], start, end)
+        if ticker not in wide.columns or wide[ticker].dropna().empty:
+            raise ValueError(f"No data returned for {ticker}")
+        df = wide[[ticker]].dropna().rename(columns={ticker: "adj_close"})
+        df.index.name = "date"
+        return df
+
+    import yfinance as yf # slow to import; only needed when actually downloading
     df = yf.download(ticker, start=start, end=end, auto_adjust=False, progress=False)
     if df.empty:
         raise ValueError(f"No data returned for {ticker}")
@@ -17,10 +50,161 @@ def fetch_prices(ticker: str, start: str, end: str) -> pd.DataFrame:
         df.index.name = "date"
         return df
 
-def make_forward_returns(prices: pd.DataFrame) -> pd.DataFrame:
+class YFinanceProvider:
+    """Price provider backed by yfinance; one bulk download for all tickers."""
+    def fetch(self, tickers: List[str], start: str, end: str) -> pd.DataFrame:
+        """
+        Adjusted closes, index = date (tz-naive), one column per ticker that was
+        answered; end is exclusive. Raises if no ticker was.
+        """
+        import yfinance as yf
+
+        df = yf.download(list(tickers), start=start, end=end, auto_adjust=False, progress=False, group_by="column")
+        if df is None or df.empty:
+            adj = pd.DataFrame(columns=list(tickers), dtype="float64")
+        else:
+            adj = df["Adj Close"]
+            if isinstance(adj, pd.Series): # older yfinance, single ticker
+                adj = adj.to_frame(tickers[0])
+            idx = pd.to_datetime(adj.index)
+            adj.index = (idx.tz_localize(None) if idx.tz is not None else idx).normalize() # 00:00:00, tz-naive
+        # yfinance logs network/API errors instead of raising and reports "no price data" for
+        # weekend-only ranges the same way, so no rows only counts as an answer without trading days
+        if trading_days(start, end).empty:
+            return adj.reindex(columns=list(tickers))
+        answered = [t for t in tickers if t in adj.columns and adj[t].notna().any()]
+        if not answered:
+            raise RuntimeError(f"yfinance returned no prices for {', '.join(tickers)} from {start} to {end}")
+        return adj[answered]
+
+class CsvProvider:
+    """
+    File-based stand-in for yfinance (tests, offline runs):
+    reads <directory>/<TICKER>.csv with 'date' and 'adj_close' columns.
+    Tickers without a file are left out of the result (not answered).
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.calls = 0
+
+    def fetch(self, tickers: List[str], start: str, end: str) -> pd.DataFrame:
+        self.calls += 1
+        cols = {}
+        for t in tickers:
+            path = os.path.join(self.directory, f"{t}.csv")
+            if not os.path.exists(path):
+                continue
+            s = pd.read_csv(path, index_col="date", parse_dates=True)["adj_close"]
+            cols[t] = s[(s.index >= pd.Timestamp(start)) & (s.index < pd.Timestamp(end))]
+        return pd.DataFrame(cols)
+
+class PriceStore:
+    """
+    Local SQLite store of daily adjusted closes keyed by (ticker, date).
+    Also records which [start, end) ranges were already requested per ticker,
+    so holidays/weekends are not mistaken for gaps; only uncovered ranges go
+    to the provider. A range counts as covered for every ticker the provider
+    answered, with or without rows (a weekend-only gap has none); a ticker left
+    out of the result or a call that raised stays uncovered and is asked for
+    again next time. Today's (incomplete) bar is never covered.
+    """
+    def __init__(self, path: str, provider=None):
+        self.provider = provider if provider is not None else YFinanceProvider()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS prices (ticker TEXT, date TEXT, adj_close REAL, PRIMARY KEY (ticker, date))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS coverage (ticker TEXT, start TEXT, end TEXT)")
+
+    def _coverage(self, ticker: str) -> List[Tuple[str, str]]:
+        rows = self.conn.execute("SELECT start, end FROM coverage WHERE ticker = ? ORDER BY start", (ticker,))
+        return [(s, e) for s, e in rows]
+
+    @staticmethod
+    def _gaps(covered: List[Tuple[str, str]], start: str, end: str) -> List[Tuple[str, str]]:
+        """Parts of [start, end) not inside any covered interval (ISO dates compare as strings)."""
+        gaps, cur = [], start
+        for s, e in covered:
+            if e <= cur or s >= end:
+                continue
+            if s > cur:
+                gaps.append((cur, s))
+            cur = max(cur, e)
+            if cur >= end:
+                break
+        if cur < end:
+            gaps.append((cur, end))
+        return gaps
+
+    def _add_coverage(self, ticker: str, start: str, end: str) -> None:
+        """Insert [start, end) and merge overlapping/adjacent intervals."""
+        merged = []
+        for s, e in sorted(self._coverage(ticker) + [(start, end)]):
+            if merged and s <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        self.conn.execute("DELETE FROM coverage WHERE ticker = ?", (ticker,))
+        self.conn.executemany("INSERT INTO coverage VALUES (?, ?, ?)", [(ticker, s, e) for s, e in merged])
+
+    def sync(self, tickers: Sequence[str], start: str, end: str) -> None:
+        """Fetch only the missing ranges; tickers with the same gap share one provider call."""
+        by_gap = {}
+        for t in tickers:
+            for gap in self._gaps(self._coverage(t), start, end):
+                by_gap.setdefault(gap, []).append(t)
+
+        today = datetime.now(timezone.utc).date().isoformat()
+        for (g_start, g_end), group in sorted(by_gap.items()):
+            try:
+                wide = self.provider.fetch(group, g_start, g_end)
+            except Exception as e: # network/API error: nothing is covered, the gap is asked for again next run
+                print(f"[warn] Price fetch failed for {', '.join(group)} from {g_start} to {g_end}: {e}")
+                continue
+            long = wide.stack().dropna() if not wide.empty else pd.Series(dtype="float64")
+            rows = [(t, d.strftime("%Y-%m-%d"), float(v)) for (d, t), v in long.items()]
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?)", rows)
+                covered_end = min(g_end, today)
+                if covered_end > g_start:
+                    for t in group:
+                        if t in wide.columns: # answered, even with no rows
+                            self._add_coverage(t, g_start, covered_end)
+
+    def get_prices(self, tickers: Sequence[str], start: str, end: str) -> pd.DataFrame:
+        """
+        Adjusted closes for all tickers in one wide frame (index = date, one
+        column per ticker), like yf.download: end is exclusive.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        self.sync(tickers, start, end)
+        marks = ",".join("?" * len(tickers))
+        long = pd.read_sql_query(
+            f"SELECT ticker, date, adj_close FROM prices WHERE ticker IN ({marks}) AND date >= ? AND date < ?",
+            self.conn, params=[*tickers, start, end],
+        )
+        wide = long.pivot(index="date", columns="ticker", values="adj_close").reindex(columns=tickers)
+        wide.index = pd.to_datetime(wide.index)
+        wide.index.name = "date"
+        wide.columns.name = None
+        return wide.sort_index()
+
+    def close(self) -> None:
+        self.conn.close()
+
+def make_forward_returns(prices: pd.DataFrame, horizons: Sequence[int] = (1,)) -> pd.DataFrame:
     """
     Compute forward 1-day returns: r_{t+1} = (P_{t+1}/P_t - 1).
+
+    With a wide frame of several tickers (e.g. PriceStore.get_prices), returns
+    one column per (ret_fwd_{h}d, ticker) for every horizon h in a single
+    vectorised pass; rows are kept where some tickers have no price (NaN).
     """
+    if "adj_close" not in prices.columns:
+        wide = prices.sort_index()
+        out = pd.concat({f"ret_fwd_{h}d": wide.shift(-h) / wide - 1.0 for h in horizons}, axis=1)
+        out.index = pd.to_datetime(out.index).normalize()
+        out.index.name = "date"
+        return out.dropna(how="all")
+
     s = prices["adj_close"] # Pulls out the adj_close column as a Series s.
 
     fwd = s.shift(-1) / s - 1.0 # e.g., Today’s adj close = 100, tomorrow’s = 105 -> return = 105/100 - 1 = 0.05 (5%).
@@ -28,7 +212,11 @@ def make_forward_returns(prices: pd.DataFrame) -> pd.DataFrame:
     # Builds a new DataFrame with two columns:
     #   adj_close: the price at time t
     #   ret_fwd_1d: the forward 1-day return from t → t+1
-    out = pd.DataFrame({"adj_close": s, "ret_fwd_1d": fwd}).dropna()
+    cols = {"adj_close": s, "ret_fwd_1d": fwd}
+    for h in horizons:
+        if h != 1:
+            cols[f"ret_fwd_{h}d"] = s.shift(-h) / s - 1.0
+    out = pd.DataFrame(cols).dropna()
     out.index = pd.to_datetime(out.index).normalize() # ensure same normalisation
     out.index.name = "date"
-    return out
\ No newline at end of file
+    return out
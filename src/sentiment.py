@@ -0,0 +1,282 @@
+import string
+from typing import Dict, List
+
+import numpy as np
+
+from src.cache import package_version
+
+SCORE_KEYS = ("neg", "neu", "pos", "compound") # same keys / order as VADER's polarity_scores
+
+class VaderBackend:
+    """The reference scorer: vaderSentiment's SentimentIntensityAnalyzer, one text at a time."""
+    name = "vader"
+
+    def __init__(self):
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        self.analyser = SentimentIntensityAnalyzer()
+        self.version = package_version("vaderSentiment")
+
+    def polarity_scores(self, text: str) -> Dict[str, float]:
+        return self.analyser.polarity_scores(text)
+
+    def score_batch(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """neg/neu/pos/compound arrays, one entry per text."""
+        out = {k: np.empty(len(texts)) for k in SCORE_KEYS}
+        for i, text in enumerate(texts):
+            scores = self.analyser.polarity_scores(text)
+            for k in SCORE_KEYS:
+                out[k][i] = scores[k]
+        return out
+
+class LexiconBackend:
+    """
+    High-throughput VADER: the lexicon, booster, negation and idiom tables are
+    compiled once into a token -> id hash table plus per-id NumPy arrays, and
+    a whole batch is scored at once. Python only splits and looks up tokens;
+    VADER's rules (boosters with distance decay, ALL-CAPS emphasis, negation
+    within 3 tokens, "no", "least", "never so", "kind of", special-case idioms,
+    "but" weighting, ! / ? emphasis, emoji descriptions) run as array ops over
+    the flattened batch using shifted-token arrays.
+
+    Tolerance: |compound - VADER compound| <= 1e-4 (one rounding step; sums
+    are taken in the same order, so in practice scores are identical - they
+    are on the sample data, the bench corpus and a 30k-text rule fuzz).
+    bench/bench_pipeline.py --stages sentiment reports the measured agreement.
+    """
+    name = "lexicon"
+
+    def __init__(self):
+        import vaderSentiment.vaderSentiment as vs
+
+        self.vs = vs
+        analyser = vs.SentimentIntensityAnalyzer()
+        self.emojis = analyser.emojis
+        self.version = f"lexicon-1:vader={package_version('vaderSentiment')}"
+
+        specials = [tuple(k.split()) for k in vs.SPECIAL_CASES if " " in k]
+        booster_ngrams = [tuple(k.split()) for k in vs.BOOSTER_DICT if " " in k]
+        words = set(analyser.lexicon) | set(vs.BOOSTER_DICT) | set(vs.NEGATE)
+        words |= {w for seq in specials + booster_ngrams for w in seq}
+        words |= {"no", "or", "nor", "kind", "of", "but", "least", "at", "very", "never", "so", "this", "without", "doubt"}
+        # id 0 = unknown token, id len+1 = padding beyond the start / end of a text
+        self.vocab = {w: i for i, w in enumerate(sorted(words), start=1)}
+        self.pad = len(self.vocab) + 1
+        size = self.pad + 1
+
+        self.valence = np.zeros(size)
+        self.in_lex = np.zeros(size, dtype=bool)
+        for w, v in analyser.lexicon.items():
+            if w in self.vocab:
+                self.valence[self.vocab[w]] = v
+                self.in_lex[self.vocab[w]] = True
+        self.booster = np.zeros(size)
+        self.is_booster = np.zeros(size, dtype=bool)
+        for w, b in vs.BOOSTER_DICT.items():
+            if " " not in w:
+                self.booster[self.vocab[w]] = b
+                self.is_booster[self.vocab[w]] = True
+        self.negate = np.zeros(size, dtype=bool)
+        for w in words:
+            if w in vs.NEGATE or "n't" in w:
+                self.negate[self.vocab[w]] = True
+        self.specials = [(tuple(self.vocab[w] for w in seq), vs.SPECIAL_CASES[" ".join(seq)]) for seq in specials]
+        self.booster_ngrams = [(tuple(self.vocab[w] for w in seq), vs.BOOSTER_DICT[" ".join(seq)]) for seq in booster_ngrams]
+        self.id = {w: self.vocab[w] for w in ("no", "or", "nor", "kind", "of", "but", "least", "at", "very",
+                                              "never", "so", "this", "without", "doubt")}
+
+    def _demojize(self, text: str) -> str:
+        """VADER's emoji -> description pass; only non-ASCII texts can contain emojis."""
+        if text.isascii():
+            return text.strip()
+        out, prev_space = [], True
+        for ch in text:
+            if ch in self.emojis:
+                if not prev_space:
+                    out.append(" ")
+                out.append(self.emojis[ch])
+                prev_space = False
+            else:
+                out.append(ch)
+                prev_space = ch == " "
+        return "".join(out).strip()
+
+    def _tokenize(self, texts: List[str]):
+        punct = string.punctuation
+        vocab_get = self.vocab.get
+        tokens, lengths, ep, qm = [], np.zeros(len(texts), dtype=np.int64), np.zeros(len(texts)), np.zeros(len(texts))
+        for i, text in enumerate(texts):
+            text = self._demojize(text)
+            # VADER's _strip_punc_if_word: keep the raw token when stripping leaves <= 2 chars (emoticons)
+            words = [s if len(s := w.strip(punct)) > 2 else w for w in text.split()]
+            tokens.extend(words)
+            lengths[i] = len(words)
+            ep[i] = min(text.count("!"), 4)
+            qm[i] = text.count("?")
+        lower = [t.lower() for t in tokens]
+        ids = np.array([vocab_get(t, 0) for t in lower], dtype=np.int64)
+        upper = np.array([t.isupper() for t in tokens], dtype=bool)
+        # contractions such as "shouldn't've" negate too, whether or not they are in the tables
+        nt = np.array(["n't" in t for t in lower], dtype=bool) if any("n't" in t for t in lower) else np.zeros(len(lower), dtype=bool)
+        return ids, upper, nt, lengths, ep, qm
+
+    def score_batch(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """neg/neu/pos/compound arrays, one entry per text."""
+        ids, upper, nt, lengths, ep, qm = self._tokenize(texts)
+        n_docs, n = len(texts), len(ids)
+        C, N = self.vs.C_INCR, self.vs.N_SCALAR
+        I = self.id
+
+        doc = np.repeat(np.arange(n_docs), lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if n_docs else np.zeros(0, dtype=np.int64)
+        pos = np.arange(n) - np.repeat(starts, lengths)
+        length = np.repeat(lengths, lengths)
+        n_upper = np.bincount(doc, weights=upper, minlength=n_docs)
+        cap_diff = ((n_upper > 0) & (n_upper < lengths))[doc] # some but not all tokens ALL CAPS
+
+        def shifted(a, k, fill):
+            """a[i - k] within the same text (k < 0 looks ahead); fill outside it."""
+            out = np.full(n, fill, dtype=a.dtype)
+            if k > 0:
+                out[k:] = a[:-k]
+                out[pos < k] = fill
+            else:
+                out[:k] = a[-k:]
+                out[pos >= length + k] = fill
+            return out
+
+        n1 = shifted(ids, -1, self.pad)
+        # only lexicon words get a valence; boosters and "kind" in "kind of" score 0
+        active = self.in_lex[ids] & ~self.is_booster[ids] & ~((ids == I["kind"]) & (n1 == I["of"]))
+        idx = np.nonzero(active)[0]
+        w0, w_n1 = ids[idx], n1[idx]
+        w_n2 = shifted(ids, -2, self.pad)[idx]
+        p = [None] + [shifted(ids, k, self.pad)[idx] for k in (1, 2, 3)]
+        p_upper = [None] + [shifted(upper, k, False)[idx] for k in (1, 2, 3)]
+        p_nt = [None] + [shifted(nt, k, False)[idx] for k in (1, 2, 3)]
+        ipos, cap = pos[idx], cap_diff[idx]
+
+        lex = self.valence[w0]
+        v = lex.copy()
+        # "no" before another lexicon word negates it instead of scoring itself
+        v[(w0 == I["no"]) & self.in_lex[w_n1]] = 0.0
+        no_before = (p[1] == I["no"]) | (p[2] == I["no"]) | ((p[3] == I["no"]) & ((p[1] == I["or"]) | (p[1] == I["nor"])))
+        v = np.where(no_before, lex * N, v)
+        caps = upper[idx] & cap
+        v = np.where(caps, np.where(v > 0, v + C, v - C), v)
+
+        for k in (1, 2, 3): # preceding token at distance k (VADER's start_i = k - 1)
+            pk = p[k]
+            m = (ipos >= k) & ~self.in_lex[pk]
+            s = np.where(v < 0, -self.booster[pk], self.booster[pk])
+            s = np.where(p_upper[k] & cap & self.is_booster[pk], np.where(v > 0, s + C, s - C), s)
+            s = s * (1.0, 0.95, 0.9)[k - 1]
+            v = np.where(m, v + s, v)
+
+            negated = self.negate[pk] | p_nt[k]
+            if k == 1:
+                v = np.where(m & negated, v * N, v)
+            elif k == 2:
+                never_so = (p[2] == I["never"]) & ((p[1] == I["so"]) | (p[1] == I["this"]))
+                without_doubt = (p[2] == I["without"]) & (p[1] == I["doubt"])
+                v = np.where(m & never_so, v * 1.25, np.where(m & ~without_doubt & negated, v * N, v))
+            else:
+                never_so = ((p[3] == I["never"]) & ((p[2] == I["so"]) | (p[2] == I["this"]))) | (p[1] == I["so"]) | (p[1] == I["this"])
+                without_doubt = (p[3] == I["without"]) & ((p[2] == I["doubt"]) | (p[1] == I["doubt"]))
+                v = np.where(m & never_so, v * 1.25, np.where(m & ~without_doubt & negated, v * N, v))
+                v = np.where(m, self._special_idioms(v, p, w0, w_n1, w_n2, ipos, length[idx]), v)
+
+        # "least" negates the next word, except in "at least" / "very least"
+        least = (p[1] == I["least"]) & ~self.in_lex[I["least"]]
+        least &= np.where(ipos > 1, (p[2] != I["at"]) & (p[2] != I["very"]), ipos > 0)
+        v = np.where(least, v * N, v)
+
+        # words before the first "but" count half, words after it 1.5x
+        is_but = ids == I["but"]
+        no_but = np.iinfo(np.int64).max
+        first_but = np.full(n_docs, no_but)
+        np.minimum.at(first_but, doc[is_but], pos[is_but])
+        v = self._but_check(v, doc[idx], ipos, first_but, no_but)
+
+        return self._score_valence(doc[idx], v, lengths, ep, qm)
+
+    @staticmethod
+    def _but_check(v, doc, ipos, first_but, no_but):
+        """
+        VADER's _but_check finds each valence with list.index(), so a repeated value
+        re-scales its first occurrence instead; replayed exactly for texts with a "but".
+        Only the (few) non-zero valences of those texts go through Python.
+        """
+        sel = np.nonzero((first_but[doc] != no_but) & (v != 0))[0]
+        if not len(sel):
+            return v
+        v = v.copy()
+        for group in np.split(sel, np.flatnonzero(np.diff(doc[sel])) + 1):
+            bi = first_but[doc[group[0]]]
+            vals, positions = v[group].tolist(), ipos[group].tolist()
+            for k in range(len(vals)):
+                x = vals[k]
+                j = vals.index(x)
+                if positions[j] < bi:
+                    vals[j] = x * 0.5
+                elif positions[j] > bi:
+                    vals[j] = x * 1.5
+            v[group] = vals
+        return v
+
+    def _special_idioms(self, v, p, w0, w_n1, w_n2, ipos, length):
+        """VADER's _special_idioms_check, for tokens with 3 preceding words."""
+        def match(seq, cols):
+            return np.logical_and.reduce([c == w for c, w in zip(cols, seq)]) if len(seq) == len(cols) else False
+
+        # the first matching preceding sequence wins, so apply them in reverse order
+        before = [(p[1], w0), (p[2], p[1], w0), (p[2], p[1]), (p[3], p[2], p[1]), (p[3], p[2])]
+        out = v
+        for cols in reversed(before):
+            for seq, value in self.specials:
+                out = np.where(match(seq, cols), value, out)
+        for seq, value in self.specials: # sequences starting at the word override those
+            if len(seq) == 2:
+                out = np.where((ipos < length - 1) & match(seq, (w0, w_n1)), value, out)
+        for seq, value in self.specials:
+            if len(seq) == 3:
+                out = np.where((ipos < length - 2) & match(seq, (w0, w_n1, w_n2)), value, out)
+        for cols in ((p[3], p[2], p[1]), (p[3], p[2]), (p[2], p[1])):
+            for seq, b in self.booster_ngrams: # "kind of" / "sort of" / "just enough" before the word
+                out = np.where(match(seq, cols), out + b, out)
+        return out
+
+    @staticmethod
+    def _score_valence(doc, v, lengths, ep, qm):
+        n_docs = len(lengths)
+        sum_s = np.bincount(doc, weights=v, minlength=n_docs)
+        punct = ep * 0.292 + np.where(qm > 1, np.where(qm <= 3, qm * 0.18, 0.96), 0.0)
+        sum_s = np.where(sum_s > 0, sum_s + punct, np.where(sum_s < 0, sum_s - punct, sum_s))
+        compound = np.clip(sum_s / np.sqrt(sum_s * sum_s + 15), -1.0, 1.0)
+
+        pos_sum = np.bincount(doc, weights=np.where(v > 0, v + 1, 0.0), minlength=n_docs)
+        neg_sum = np.bincount(doc, weights=np.where(v < 0, v - 1, 0.0), minlength=n_docs)
+        neu_count = lengths - np.bincount(doc, weights=v != 0, minlength=n_docs)
+        more_pos, more_neg = pos_sum > -neg_sum, pos_sum < -neg_sum
+        pos_sum = np.where(more_pos, pos_sum + punct, pos_sum)
+        neg_sum = np.where(more_neg, neg_sum - punct, neg_sum)
+        total = pos_sum - neg_sum + neu_count
+        empty = lengths == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = {
+                "neg": np.abs(neg_sum / total),
+                "neu": np.abs(neu_count / total),
+                "pos": np.abs(pos_sum / total),
+                "compound": compound,
+            }
+        # Python's round(), not np.round, so ties round exactly as VADER's do
+        return {k: np.array([round(x, 4 if k == "compound" else 3) for x in np.where(empty, 0.0, a).tolist()])
+                for k, a in scores.items()}
+
+BACKENDS = {"vader": VaderBackend, "lexicon": LexiconBackend}
+
+def get_backend(name: str = "vader"):
+    """Sentiment backend by name ("vader" or "lexicon")."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown sentiment backend: {name} (choose from {sorted(BACKENDS)})")
@@ -0,0 +1,444 @@
+import argparse
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import yaml
+
+from src.cache import ResultCache
+from src.clean import Cleaner, is_english
+from src.features import FeatureProcessor, DailyAccumulator
+from src.storage import get_storage, STORAGES
+from src.utils import to_epoch_seconds
+from src.windows import WindowedFeatures
+
+class LatencyStats:
+    """Timings of the last `window` batches; every *_ms field is summarised as p50/p90/p99/max."""
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, window: int = 1000):
+        self.batches = deque(maxlen=window)
+
+    def add(self, timings: Dict) -> None:
+        self.batches.append(timings)
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        if not self.batches:
+            return {}
+        out = {}
+        for key in [k for k in self.batches[-1] if k.endswith("_ms")]:
+            values = np.array([b[key] for b in self.batches])
+            out[key] = {f"p{q}": round(float(v), 3) for q, v in zip(self.PERCENTILES, np.percentile(values, self.PERCENTILES))}
+            out[key]["max"] = round(float(values.max()), 3)
+        return out
+
+class ScoreRequest:
+    """Records submitted together; done is set once the batch they went out in has been processed."""
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.scored = None # the submitted records that were kept, with scores / weight / tags attached
+        self.batch = None # timings of that batch
+        self.latency_ms = None # submit -> done for this request
+        self.error = None
+
+class ScoringService:
+    """
+    Long-running scorer: Cleaner and FeatureProcessor (language profiles,
+    sentiment lexicon, compiled regexes) are loaded once and kept warm.
+    Records submitted from any thread are gathered by one worker thread into
+    micro-batches - up to batch_size records, waiting at most max_wait_ms after
+    the first one - then filtered, cleaned, scored and weighted exactly as
+    run.py does, and added to in-memory daily (and, with a windows section,
+    hourly) running sums.
+
+    The sums are saved to state_dir in the --incremental partition format
+    (daily_sums.csv, hourly_sums.csv) every save_every_s seconds and on stop,
+    and loaded again on start. Per-batch timings are kept for latency
+    percentiles.
+    """
+    def __init__(self, cfg: dict, batch_size: int = 256, max_wait_ms: float = 20.0, start_ts: int = 0,
+                 end_ts: int = 2**63 - 1, cache_path: str = None, cache_max_entries: int = 2_000_000,
+                 storage=None, scored_out: str = None, state_dir: str = None, save_every_s: float = 60.0):
+        self.cfg = cfg
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.cache_path = cache_path
+        self.cache_max_entries = cache_max_entries
+        self.storage = storage if storage is not None else get_storage("jsonl")
+        self.scored_out = scored_out
+        self.state_dir = state_dir
+        self.save_every_s = save_every_s
+
+        t0 = time.perf_counter()
+        self.cleaner = Cleaner(cfg, storage=self.storage)
+        self.feats = FeatureProcessor(cfg, storage=self.storage)
+        is_english("warm up the language profiles") # langdetect loads its profiles on first use
+        self.feats.scorer.score_batch(["warm up the sentiment scorer"])
+        self.load_s = time.perf_counter() - t0
+
+        self.daily = DailyAccumulator()
+        self.windows = WindowedFeatures.from_config(cfg) if cfg.get("windows") else None
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+            self.load_state()
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock() # guards the sums, counters, latency stats and scored-output writer
+        self.latency = LatencyStats()
+        self.totals = Counter()
+        self.counts = Counter() # snapshot of cleaner.counts (drops by reason) after each batch
+        self.out = None
+        self.worker = None
+        self.started = time.time()
+
+    # --- state --------------------------------------------------------------
+
+    def _state_path(self, name: str) -> str:
+        return os.path.join(self.state_dir, name)
+
+    def load_state(self) -> None:
+        daily = self._state_path("daily_sums.csv")
+        if os.path.exists(daily):
+            self.daily = DailyAccumulator.load(daily)
+        hourly = self._state_path("hourly_sums.csv")
+        if self.windows is not None and os.path.exists(hourly):
+            self.windows.load(hourly)
+
+    def save_state(self) -> List[str]:
+        """Write the running sums to state_dir (atomically) and flush scored output; returns the paths written."""
+        if not self.state_dir:
+            return []
+        with self.lock:
+            if self.out is not None:
+                self.out.flush()
+            saves = [("daily_sums.csv", self.daily.save)]
+            if self.windows is not None:
+                saves.append(("hourly_sums.csv", self.windows.save))
+            paths = []
+            for name, save in saves:
+                path = self._state_path(name)
+                save(path + ".tmp")
+                os.replace(path + ".tmp", path) # a crash never leaves half-written sums
+                paths.append(path)
+        return paths
+
+    # --- requests -----------------------------------------------------------
+
+    def start(self) -> "ScoringService":
+        self.worker = threading.Thread(target=self._run, name="scoring-worker", daemon=True)
+        self.worker.start()
+        return self
+
+    def stop(self) -> None:
+        """Process everything already submitted, then save state."""
+        self.queue.put(None)
+        self.worker.join()
+        self.save_state()
+
+    def submit(self, records: List[Dict]) -> ScoreRequest:
+        req = ScoreRequest(records)
+        self.queue.put(req)
+        return req
+
+    def score(self, records: List[Dict], timeout: float = None) -> ScoreRequest:
+        """Submit records and wait for their batch; returns the finished request."""
+        req = self.submit(records)
+        if not req.done.wait(timeout):
+            raise TimeoutError(f"batch not processed within {timeout}s")
+        if req.error is not None:
+            raise req.error
+        return req
+
+    # --- worker -------------------------------------------------------------
+
+    def _run(self) -> None:
+        # SQLite connections belong to the thread that opened them, so the cache lives here
+        cache = ResultCache(self.cache_path, max_entries=self.cache_max_entries) if self.cache_path else None
+        self.cleaner.cache = self.feats.cache = cache
+        if self.scored_out:
+            self.out = self.storage.writer(self.scored_out, append=True)
+        last_save = time.monotonic()
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._process(batch)
+                if self.state_dir and time.monotonic() - last_save >= self.save_every_s:
+                    if cache is not None:
+                        cache.flush()
+                    self.save_state()
+                    last_save = time.monotonic()
+                if stop:
+                    return
+        finally:
+            with self.lock:
+                if self.out is not None:
+                    self.out.close()
+                    self.out = None
+            if cache is not None:
+                cache.close()
+
+    def _next_batch(self):
+        """(requests, stop): blocks for the first request, then gathers more until batch_size or max_wait."""
+        first = self.queue.get()
+        if first is None:
+            return [], True
+        batch, n = [first], len(first.records)
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                req = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if req is None:
+                return batch, True
+            batch.append(req)
+            n += len(req.records)
+        return batch, False
+
+    def _process(self, batch: List[ScoreRequest]) -> None:
+        import pandas as pd
+
+        t0 = time.perf_counter()
+        records = [rec for req in batch for rec in req.records]
+        owner = {id(rec): req for req in batch for rec in req.records}
+        try:
+            cleaned = []
+            for rec in self.cleaner.filter_records(records, self.start_ts, self.end_ts):
+                try:
+                    norm = self.cleaner.normalize_record(rec)
+                    if norm is not None and norm.text.strip(): # process_file skips empty text_clean too
+                        cleaned.append(self.cleaner.tag_record(rec, norm.lower))
+                except Exception as e: # a malformed record fails its own request only
+                    owner[id(rec)].error = e
+            t1 = time.perf_counter()
+            scores = self.feats.get_scores_many([rec["text_clean"] for rec in cleaned])
+            scored = []
+            for rec, sc in zip(cleaned, scores):
+                try:
+                    scored.append(self.feats.attach_scores(rec, sc))
+                except Exception as e: # e.g. a non-numeric num_comments in compute_weight
+                    owner[id(rec)].error = e
+            # a failed request is all-or-nothing: none of its records reach the sums or the scored output
+            scored = [rec for rec in scored if owner[id(rec)].error is None]
+            t2 = time.perf_counter()
+            in_scope = [rec for rec in scored if rec["in_scope"]]
+            frame = pd.DataFrame({
+                "created_utc": [rec["created_utc"] for rec in in_scope],
+                "compound": [rec["compound"] for rec in in_scope],
+                "weight": [rec["weight"] for rec in in_scope],
+            })
+            failed = sum(req.error is not None for req in batch)
+            with self.lock:
+                self.daily.update(frame)
+                if self.windows is not None:
+                    self.windows.update(frame)
+                if self.out is not None:
+                    for rec in scored:
+                        self.out.write(rec)
+                t3 = time.perf_counter()
+                timings = {
+                    "batch": self.totals["batches"] + 1,
+                    "requests": len(batch),
+                    "failed_requests": failed,
+                    "records": len(records),
+                    "scored": len(scored),
+                    "in_scope": len(in_scope),
+                    "queue_wait_ms": (t0 - batch[0].enqueued) * 1000, # oldest request in the batch
+                    "clean_ms": (t1 - t0) * 1000,
+                    "score_ms": (t2 - t1) * 1000,
+                    "aggregate_ms": (t3 - t2) * 1000,
+                    "batch_ms": (t3 - t0) * 1000,
+                    "latency_ms": (t3 - batch[0].enqueued) * 1000,
+                }
+                self.latency.add(timings)
+                self.totals.update({"batches": 1, "requests": len(batch), "failed_requests": failed,
+                                    "records": len(records), "scored": len(scored), "in_scope": len(in_scope)})
+                self.counts = self.cleaner.counts.copy()
+        except Exception as e: # fail this batch's requests, keep serving
+            for req in batch:
+                req.error = e
+                req.done.set()
+            with self.lock:
+                self.totals["failed_batches"] += 1
+            return
+
+        kept = {id(rec) for rec in scored}
+        for req in batch:
+            if req.error is None:
+                req.scored = [rec for rec in req.records if id(rec) in kept]
+                req.batch = timings
+            req.latency_ms = (t3 - req.enqueued) * 1000
+            req.done.set()
+
+    # --- reads --------------------------------------------------------------
+
+    def features(self, kind: str = "daily"):
+        """Current features: "daily" (features_daily.csv layout), or "hourly" / "close" with windows configured."""
+        with self.lock:
+            if kind == "daily":
+                return self.daily.to_features()
+            if self.windows is None:
+                raise ValueError("the config has no windows section")
+            if kind == "hourly":
+                return self.windows.hourly()
+            if kind == "close":
+                return self.windows.at_close()
+        raise ValueError(f"Unknown features: {kind} (choose from daily, hourly, close)")
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "load_s": round(self.load_s, 3),
+                "batch_size": self.batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self.queue.qsize(),
+                "totals": dict(self.totals),
+                "drops": {k[len("drop_"):]: v for k, v in sorted(self.counts.items()) if k.startswith("drop_")},
+                "latency": self.latency.percentiles(),
+                "last_batches": [{k: round(v, 3) for k, v in b.items()} for b in list(self.latency.batches)[-10:]],
+            }
+
+def parse_records(body: bytes) -> List[Dict]:
+    """A JSON object, a JSON array of objects, or JSON lines (the raw ingest format)."""
+    text = body.decode("utf-8")
+    try:
+        data = json.loads(text)
+        records = [data] if isinstance(data, dict) else data
+    except json.JSONDecodeError:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError("expected a JSON object, an array of objects or JSON lines")
+    return records
+
+def make_handler(service: ScoringService, timeout: float = 30.0, quiet: bool = False):
+    class Handler(BaseHTTPRequestHandler):
+        """
+        POST /score        raw records; ?wait=0 returns 202 without waiting for the batch
+        POST /snapshot     save the running sums to the state dir now
+        GET  /features/daily | /features/hourly | /features/close
+        GET  /stats        counters, drops by reason, per-batch latency percentiles
+        GET  /health
+        """
+        def _send(self, code: int, body, content_type: str = "application/json") -> None:
+            data = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                self._send(200, {"ok": True})
+            elif path == "/stats":
+                self._send(200, service.stats())
+            elif path.startswith("/features/"):
+                try:
+                    df = service.features(path[len("/features/"):])
+                except ValueError as e:
+                    self._send(404, {"error": str(e)})
+                    return
+                self._send(200, df.reset_index().to_json(orient="records", date_format="iso", double_precision=15))
+            else:
+                self._send(404, {"error": f"no such endpoint: {path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/snapshot":
+                self._send(200, {"saved": service.save_state()})
+                return
+            if url.path != "/score":
+                self._send(404, {"error": f"no such endpoint: {url.path}"})
+                return
+            try:
+                records = parse_records(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except (ValueError, UnicodeDecodeError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            if parse_qs(url.query).get("wait", ["1"])[0] == "0":
+                service.submit(records)
+                self._send(202, {"received": len(records)})
+                return
+            try:
+                req = service.score(records, timeout=timeout)
+            except TimeoutError as e:
+                self._send(503, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self._send(200, {"received": len(records), "scored": len(req.scored), "latency_ms": round(req.latency_ms, 3),
+                             "batch": {k: round(v, 3) for k, v in req.batch.items()}, "records": req.scored})
+
+        def log_message(self, fmt, *args):
+            if not quiet:
+                super().log_message(fmt, *args)
+
+    return Handler
+
+def main():
+    ap = argparse.ArgumentParser(description="Local scoring daemon: warm models, micro-batched cleaning/scoring, live daily features")
+    ap.add_argument("--config", default="config/scope_energy.yaml", help="Scope config")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--batch_size", type=int, default=256, help="Max records per micro-batch")
+    ap.add_argument("--max_wait_ms", type=float, default=20.0, help="Max time a batch waits to fill after its first record")
+    ap.add_argument("--state_dir", default="data/service", help="Running sums, result cache and scored output")
+    ap.add_argument("--save_every_s", type=float, default=60.0, help="How often the running sums are saved")
+    ap.add_argument("--scored_out", action="store_true", help="Append scored records to <state_dir>/scored_posts")
+    ap.add_argument("--storage", default="jsonl", choices=sorted(STORAGES), help="Format of the scored output")
+    ap.add_argument("--start", default=None, help="Drop records before this date (YYYY-MM-DD)")
+    ap.add_argument("--end", default=None, help="Drop records after this date (YYYY-MM-DD)")
+    ap.add_argument("--timeout_s", type=float, default=30.0, help="How long a /score request waits for its batch")
+    ap.add_argument("--no_cache", action="store_true", help="Disable the on-disk language/sentiment result cache")
+    ap.add_argument("--cache_max_entries", type=int, default=2_000_000, help="Max cached results kept (LRU eviction)")
+    ap.add_argument("--quiet", action="store_true", help="Don't log each HTTP request")
+    args = ap.parse_args()
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+    os.makedirs(args.state_dir, exist_ok=True)
+    storage = get_storage(args.storage)
+    service = ScoringService(
+        cfg, batch_size=args.batch_size, max_wait_ms=args.max_wait_ms,
+        start_ts=to_epoch_seconds(args.start) if args.start else 0,
+        end_ts=to_epoch_seconds(args.end) + (24 * 3600 - 1) if args.end else 2**63 - 1,
+        cache_path=None if args.no_cache else os.path.join(args.state_dir, "result_cache.sqlite"),
+        cache_max_entries=args.cache_max_entries, storage=storage,
+        scored_out=storage.path(os.path.join(args.state_dir, "scored_posts")) if args.scored_out else None,
+        state_dir=args.state_dir, save_every_s=args.save_every_s,
+    ).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.timeout_s, args.quiet))
+    # shutdown() waits for serve_forever() to return, so it has to run off the serving thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Scoring {cfg.get('name', '')} on http://{args.host}:{args.port} (models loaded in {service.load_s:.2f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        print(f"Stopped; running sums saved to {args.state_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd # imported where frames are used, so record-only callers skip it
+
+class JsonlStorage:
+    """One JSON object per line; the original work-directory format."""
+    name = "jsonl"
+    ext = ".jsonl"
+
+    def __init__(self, ensure_ascii: bool = False):
+        self.ensure_ascii = ensure_ascii
+
+    def path(self, base: str) -> str:
+        return base + self.ext
+
+    def writer(self, path: str, append: bool = False) -> "JsonlWriter":
+        return JsonlWriter(path, self.ensure_ascii, append)
+
+    def read_records(self, path: str) -> Iterator[Dict]:
+        with open(path, "r", encoding="utf-8") as fin:
+            for line in fin:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def read_frames(self, path: str, columns: Optional[List[str]] = None, chunk_size: int = 100_000) -> Iterator["pd.DataFrame"]:
+        """DataFrame chunks; columns is a projection (absent columns are skipped)."""
+        import pandas as pd
+
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False)
+        for df in reader:
+            yield df if columns is None else df[[c for c in columns if c in df.columns]]
+
+class JsonlWriter:
+    def __init__(self, path: str, ensure_ascii: bool, append: bool = False):
+        self.fout = open(path, "a" if append else "w", encoding="utf-8")
+        self.ensure_ascii = ensure_ascii
+
+    def write(self, rec: Dict) -> None:
+        self.fout.write(json.dumps(rec, ensure_ascii=self.ensure_ascii) + "\n")
+
+    def write_frame(self, df: "pd.DataFrame") -> None:
+        if not df.empty:
+            # pandas' default double_precision=10 would round floats that write() keeps in full
+            df.to_json(self.fout, orient="records", lines=True, force_ascii=self.ensure_ascii, double_precision=15)
+
+    def flush(self) -> None:
+        self.fout.flush()
+        os.fsync(self.fout.fileno())
+
+    def close(self) -> None:
+        self.fout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ParquetStorage:
+    """
+    Compressed columnar dataset, one directory per dataset, partitioned
+    by UTC calendar day of created_utc: <path>/date=YYYY-MM-DD/part-NNNNN.parquet
+    Requires pyarrow.
+    """
+    name = "parquet"
+    ext = ".parquet"
+
+    def __init__(self, compression: str = "zstd", batch_size: int = 50_000):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet storage needs pyarrow: pip install pyarrow") from e
+        self.compression = compression
+        self.batch_size = batch_size
+
+    def path(self, base: str) -> str:
+        return base + self.ext
+
+    def writer(self, path: str, append: bool = False) -> "ParquetWriter":
+        return ParquetWriter(path, self.compression, self.batch_size, append)
+
+    def files(self, path: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(path, "date=*", "*.parquet")))
+
+    def read_tables(self, path: str, columns: Optional[List[str]] = None):
+        import pyarrow.parquet as pq
+
+        for f in self.files(path):
+            if columns is None:
+                yield pq.read_table(f)
+            else:
+                present = set(pq.read_schema(f).names)
+                yield pq.read_table(f, columns=[c for c in columns if c in present])
+
+    def read_records(self, path: str) -> Iterator[Dict]:
+        for table in self.read_tables(path):
+            for row in table.to_pylist():
+                # Columns are the union over all rows; drop nulls so records look like the JSONL ones
+                yield {k: v for k, v in row.items() if v is not None}
+
+    def read_frames(self, path: str, columns: Optional[List[str]] = None, chunk_size: int = 100_000) -> Iterator["pd.DataFrame"]:
+        """One DataFrame per part file; columns are read selectively from disk."""
+        for table in self.read_tables(path, columns):
+            for batch in table.to_batches(max_chunksize=chunk_size):
+                yield batch.to_pandas()
+
+class ParquetWriter:
+    def __init__(self, path: str, compression: str, batch_size: int, append: bool = False):
+        if os.path.isdir(path) and not append:
+            shutil.rmtree(path) # overwrite, like open(path, "w")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.compression = compression
+        self.batch_size = batch_size
+        self.rows = []
+        # appending adds new part files after the existing ones
+        existing = [os.path.basename(f) for f in glob.glob(os.path.join(path, "date=*", "part-*.parquet"))]
+        self.seq = 1 + max((int(f[5:-8]) for f in existing), default=-1)
+
+    def write(self, rec: Dict) -> None:
+        self.rows.append(rec)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def write_frame(self, df: "pd.DataFrame") -> None:
+        self.flush()
+        self._write_partitions(df)
+
+    def flush(self) -> None:
+        if self.rows:
+            import pandas as pd
+
+            self._write_partitions(pd.DataFrame(self.rows))
+            self.rows = []
+
+    @staticmethod
+    def _day(ts) -> str:
+        import pandas as pd
+
+        if ts is None or pd.isna(ts):
+            return "unknown"
+        return datetime.fromtimestamp(int(ts), tz=timezone.utc).strftime("%Y-%m-%d")
+
+    def _write_partitions(self, df: "pd.DataFrame") -> None:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df.empty:
+            return
+        if "created_utc" in df.columns:
+            days = df["created_utc"].map(self._day)
+        else:
+            days = pd.Series("unknown", index=df.index)
+        for day, part in df.groupby(days, sort=True):
+            outdir = os.path.join(self.path, f"date={day}")
+            os.makedirs(outdir, exist_ok=True)
+            table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+            pq.write_table(table, os.path.join(outdir, f"part-{self.seq:05d}.parquet"), compression=self.compression)
+        self.seq += 1
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+STORAGES = {"jsonl": JsonlStorage, "parquet": ParquetStorage}
+
+def get_storage(name: str = "jsonl"):
+    """Storage backend by name ("jsonl" or "parquet")."""
+    try:
+        return STORAGES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown storage format: {name} (choose from {sorted(STORAGES)})")
@@ -0,0 +1,200 @@
+import math
+from typing import Dict, Iterable
+
+import numpy as np
+
+from src.features import DailyAccumulator
+
+class WindowedFeatures:
+    """
+    Hour-bucketed running sums of scored records, from which several
+    feature granularities are emitted in one pass:
+      - hourly weighted / plain mean sentiment (UTC hours),
+      - daily UTC features (same as DailyAccumulator / features_daily.csv),
+      - rolling windows of N hours ending at the market close (e.g. the
+        last 24h up to 16:00 ET) for each trading day,
+      - exponentially decayed sentiment indices for each half-life.
+
+    Each record is added to its hour bucket in O(1), together with its
+    decayed contribution at the end of that hour, so rolling sums (prefix
+    sums over buckets) and decayed indices (one recursion over buckets) are
+    exact at every hour boundary without revisiting records. State grows
+    with the number of hours, not records; it merges across shards and can
+    be saved and updated with new records later without rereading history.
+    """
+    SUMS = DailyAccumulator.COLUMNS
+
+    def __init__(self, rolling_hours: Iterable[int] = (24,), halflife_hours: Iterable[float] = (24,),
+                 close: str = "16:00", tz: str = "America/New_York"):
+        self.rolling_hours = [int(h) for h in rolling_hours]
+        self.halflife_hours = [float(h) for h in halflife_hours]
+        hh, mm = (int(x) for x in close.split(":"))
+        if mm:
+            raise ValueError(f"close must be on the hour, got {close}") # windows are built from hourly buckets
+        self.close_hour = hh
+        self.close = close
+        self.tz = tz
+        self.decay = [math.log(2) / (h * 3600.0) for h in self.halflife_hours] # per second
+        self.columns = self.SUMS + [f"{p}_{h:g}h" for h in self.halflife_hours for p in ("ew_wc", "ew_w")]
+        self.buckets: Dict[int, np.ndarray] = {} # hours since epoch -> sums in self.columns order
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "WindowedFeatures":
+        w = cfg.get("windows", {})
+        return cls(rolling_hours=w.get("rolling_hours", [24]), halflife_hours=w.get("ew_halflife_hours", [24]),
+                   close=str(w.get("close", "16:00")), tz=w.get("timezone", "America/New_York"))
+
+    def update(self, df) -> None:
+        """Add a chunk with created_utc, compound and weight columns (already filtered to in-scope rows)."""
+        import pandas as pd
+
+        if df.empty:
+            return
+        compound = pd.to_numeric(df["compound"], errors="coerce").to_numpy(dtype=np.float64)
+        weight = pd.to_numeric(df["weight"], errors="coerce").to_numpy(dtype=np.float64)
+        ts = pd.to_numeric(df["created_utc"]).to_numpy(dtype=np.float64)
+        hour = np.floor(ts / 3600.0).astype(np.int64)
+        to_hour_end = (hour + 1) * 3600.0 - ts
+        wc = compound * weight
+        cols = [wc, weight, compound, ~np.isnan(compound), np.ones(len(ts))]
+        for lam in self.decay:
+            d = np.exp(-lam * to_hour_end)
+            cols += [wc * d, weight * d]
+        # NaNs are skipped, like the pandas groupby sums in DailyAccumulator
+        values = np.nan_to_num(np.column_stack(cols).astype(np.float64), nan=0.0)
+
+        hours, inverse = np.unique(hour, return_inverse=True)
+        part = np.zeros((len(hours), len(self.columns)))
+        np.add.at(part, inverse, values)
+        for h, row in zip(hours.tolist(), part):
+            if h in self.buckets:
+                self.buckets[h] += row
+            else:
+                self.buckets[h] = row
+
+    def merge(self, other: "WindowedFeatures") -> "WindowedFeatures":
+        """Combine partial state (e.g. from separate shards) in place."""
+        for h, row in other.buckets.items():
+            if h in self.buckets:
+                self.buckets[h] = self.buckets[h] + row
+            else:
+                self.buckets[h] = row.copy()
+        return self
+
+    def trim(self, start_ts: int, end_ts: int) -> "WindowedFeatures":
+        """
+        Drop hour buckets outside [start_ts, end_ts] (epoch seconds, whole hours such as
+        a UTC-day window), as if records outside it had never been added; returns self.
+        """
+        self.buckets = {h: row for h, row in self.buckets.items() if start_ts <= h * 3600 <= end_ts}
+        return self
+
+    def _grid(self):
+        """Contiguous hourly grid (empty hours as zeros): (first hour, sums array hours x columns)."""
+        first, last = min(self.buckets), max(self.buckets)
+        grid = np.zeros((last - first + 1, len(self.columns)))
+        for h, row in self.buckets.items():
+            grid[h - first] = row
+        return first, grid
+
+    def _decayed(self, grid) -> np.ndarray:
+        """Decayed weighted mean at the end of each hour, one column per half-life."""
+        from scipy.signal import lfilter
+
+        out = np.zeros((len(grid), len(self.decay)))
+        base = len(self.SUMS)
+        for j, lam in enumerate(self.decay):
+            a = [1.0, -math.exp(-lam * 3600.0)] # E[t] = d * E[t-1] + bucket[t]
+            wc = lfilter([1.0], a, grid[:, base + 2 * j])
+            w = lfilter([1.0], a, grid[:, base + 2 * j + 1])
+            out[:, j] = np.divide(wc, w, out=np.zeros_like(wc), where=w != 0)
+        return out
+
+    @staticmethod
+    def _means(sum_wc, sum_w, sum_c, n_c):
+        weighted = np.divide(sum_wc, sum_w, out=np.zeros_like(sum_wc), where=sum_w != 0)
+        plain = np.divide(sum_c, n_c, out=np.full_like(sum_c, np.nan), where=n_c != 0)
+        return weighted, plain
+
+    def hourly(self):
+        """One row per UTC hour (start of hour) from the first to the last hour with data."""
+        import pandas as pd
+
+        if not self.buckets:
+            return pd.DataFrame(columns=["sent_mean_weighted", "sent_mean", "n_items"], index=pd.DatetimeIndex([], name="hour"))
+        first, grid = self._grid()
+        weighted, plain = self._means(grid[:, 0], grid[:, 1], grid[:, 2], grid[:, 3])
+        out = pd.DataFrame(
+            {"sent_mean_weighted": weighted, "sent_mean": plain, "n_items": grid[:, 4].astype("int64")},
+            index=pd.DatetimeIndex(pd.to_datetime((first + np.arange(len(grid))) * 3600, unit="s"), name="hour"),
+        )
+        decayed = self._decayed(grid)
+        for j, h in enumerate(self.halflife_hours):
+            out[f"sent_ew_{h:g}h"] = decayed[:, j]
+        return out
+
+    def daily(self) -> DailyAccumulator:
+        """The same running sums per UTC calendar day."""
+        import pandas as pd
+
+        if not self.buckets:
+            return DailyAccumulator()
+        hours = sorted(self.buckets)
+        sums = pd.DataFrame([self.buckets[h][:len(self.SUMS)] for h in hours], columns=self.SUMS,
+                            index=pd.to_datetime(np.array(hours) * 3600, unit="s"))
+        return DailyAccumulator(sums.groupby(sums.index.normalize().rename("date")).sum())
+
+    def at_close(self):
+        """
+        One row per trading day (Mon-Fri, dated in the exchange time zone):
+        rolling-window means over the N hours before that day's close and the
+        decayed indices at the close. Records stamped exactly at the close
+        belong to the next window.
+        """
+        import pandas as pd
+
+        if not self.buckets:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+        first, grid = self._grid()
+        start = pd.Timestamp(first * 3600, unit="s", tz="UTC").tz_convert(self.tz).normalize().tz_localize(None)
+        end = pd.Timestamp((first + len(grid)) * 3600, unit="s", tz="UTC").tz_convert(self.tz).normalize().tz_localize(None)
+        days = pd.bdate_range(start, end, name="date")
+        closes = (days + pd.Timedelta(hours=self.close_hour)).tz_localize(self.tz).tz_convert("UTC")
+        # close as an hour-boundary index into the grid
+        close_h = np.asarray((closes - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(hours=1), dtype=np.int64) - first
+
+        prefix = np.vstack([np.zeros(grid.shape[1]), np.cumsum(grid, axis=0)]) # prefix[k] = sum of hours < k
+        clip = lambda k: np.clip(k, 0, len(grid))
+        out = pd.DataFrame(index=days)
+        for n in self.rolling_hours:
+            s = prefix[clip(close_h)] - prefix[clip(close_h - n)]
+            weighted, plain = self._means(s[:, 0], s[:, 1], s[:, 2], s[:, 3])
+            out[f"sent_mean_weighted_{n}h"] = weighted
+            out[f"sent_mean_{n}h"] = plain
+            out[f"n_items_{n}h"] = s[:, 4].astype("int64")
+        decayed = self._decayed(grid)
+        k = clip(close_h) - 1 # index of the last full hour before the close
+        for j, h in enumerate(self.halflife_hours):
+            # after the last hour with data the index only decays, so its value stays put
+            out[f"sent_ew_{h:g}h"] = np.where(k >= 0, decayed[np.maximum(k, 0), j], 0.0)
+        return out
+
+    def save(self, path: str) -> None:
+        """Persist the hour buckets so a later run can add records or merge without re-reading them."""
+        import pandas as pd
+
+        hours = sorted(self.buckets)
+        pd.DataFrame([self.buckets[h] for h in hours], columns=self.columns,
+                     index=pd.Index(hours, name="hour")).to_csv(path, index=True)
+
+    def load(self, path: str) -> "WindowedFeatures":
+        """Add buckets saved by save() (with the same windows config) to this state; returns self."""
+        import pandas as pd
+
+        df = pd.read_csv(path, index_col="hour", float_precision="round_trip")
+        missing = set(self.columns) - set(df.columns)
+        if missing:
+            raise ValueError(f"{path} was saved with different half-lives (missing {sorted(missing)})")
+        for h, row in zip(df.index.tolist(), df[self.columns].to_numpy(dtype=np.float64)):
+            self.buckets[h] = self.buckets[h] + row if h in self.buckets else row
+        return self